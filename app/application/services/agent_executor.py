@@ -0,0 +1,242 @@
+from typing import Any, Dict, List, Optional
+import asyncio
+import json
+import logging
+import time
+from app.application.services.delta_stream import DeltaStream
+from app.domain.external.llm import LLM
+from app.domain.external.sandbox import Sandbox
+from app.domain.models.tool_result import ToolResult
+from app.domain.services.tool_registry import ToolContext, ToolRegistry
+from app.infrastructure.metrics import TOOL_CALL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+_SYSTEM_PROMPT = """You are a helpful assistant working inside a sandbox with these tools:
+{tools}
+
+To use tools, reply with only a JSON object:
+{{"plan": ["step", ...], "tool_calls": [{{"id": "1", "tool": "<name>", "args": {{...}}}}, ...]}}
+All tool calls of one reply run concurrently, so only group calls that do not depend on each other.
+You will get their results and can call more tools. When the task is done, reply with the final answer as plain text."""
+
+class AgentExecutor:
+    """
+    Runs the plan/act loop for one user message: asks the LLM, executes the
+    tool calls of its reply concurrently, feeds the results back and repeats
+    until the LLM answers in plain text or `max_steps` is reached.
+    """
+
+    def __init__(
+        self,
+        llm: LLM,
+        registry: ToolRegistry,
+        max_steps: int = 10,
+        max_concurrency: int = 4,
+        max_pending_events: int = 64,
+    ):
+        self.llm = llm
+        self.registry = registry
+        self.max_steps = max_steps
+        self.max_concurrency = max_concurrency
+        # Tool events waiting for the client; a full queue blocks the tools emitting them
+        self.max_pending_events = max_pending_events
+        # Concurrency limit per sandbox, shared by every run in that sandbox
+        self._limits: Dict[str, asyncio.Semaphore] = {}
+        # Locks of the resources tools declare (e.g. the browser) per sandbox,
+        # shared by every run in that sandbox like the concurrency limit
+        self._resource_locks: Dict[str, Dict[str, asyncio.Lock]] = {}
+
+    def _limit(self, sandbox: Sandbox) -> asyncio.Semaphore:
+        if sandbox.id not in self._limits:
+            self._limits[sandbox.id] = asyncio.Semaphore(self.max_concurrency)
+        return self._limits[sandbox.id]
+
+    def _resource_lock(self, sandbox: Sandbox, key: str) -> asyncio.Lock:
+        locks = self._resource_locks.setdefault(sandbox.id, {})
+        if key not in locks:
+            locks[key] = asyncio.Lock()
+        return locks[key]
+
+    def release(self, sandbox_id: str):
+        """Forgets the concurrency limit and resource locks of a sandbox that went away."""
+        self._limits.pop(sandbox_id, None)
+        self._resource_locks.pop(sandbox_id, None)
+
+    @staticmethod
+    def _parse_reply(text: str) -> Optional[Dict[str, Any]]:
+        """Returns the decoded tool-call reply, or None for a plain-text answer."""
+        try:
+            reply = json.loads(text)
+        except json.JSONDecodeError:
+            return None
+        if not isinstance(reply, dict):
+            return None
+        if "tool" in reply:
+            # Single-call shorthand: {"tool": ..., "args": ...}
+            reply = {"tool_calls": [{"id": "1", "tool": reply["tool"], "args": reply.get("args", {})}]}
+        calls = reply.get("tool_calls") or []
+        reply["tool_calls"] = [
+            {"id": str(call.get("id") or index + 1), "tool": call.get("tool"), "args": call.get("args") or {}}
+            for index, call in enumerate(calls) if isinstance(call, dict)
+        ]
+        return reply
+
+    async def _stream_reply(self, stream: DeltaStream, stop: asyncio.Event):
+        """
+        Relays an LLM reply as `message_delta` events, holding back replies
+        that start like a JSON tool call. Setting `stop` cancels the generation.
+        """
+        watcher = asyncio.create_task(stop.wait())
+        watcher.add_done_callback(lambda task: None if task.cancelled() else stream.cancel())
+        is_tool_call = None
+        try:
+            async for delta in stream:
+                if is_tool_call is None:
+                    head = stream.text.lstrip()
+                    if not head:
+                        continue
+                    is_tool_call = head.startswith("{")
+                    delta = stream.text
+                if not is_tool_call:
+                    yield {"event": "message_delta", "data": delta}
+        finally:
+            watcher.cancel()
+
+    async def _execute(self, session_id: str, sandbox: Sandbox, calls: List[Dict[str, Any]],
+                       stop: asyncio.Event, results: Dict[str, ToolResult]):
+        """
+        Runs the tool calls of one LLM turn concurrently and yields `tool`
+        events as each one starts, reports progress and finishes. The event
+        queue is bounded, so a slow client slows down chatty tools instead of
+        letting their output pile up.
+        """
+        events: asyncio.Queue = asyncio.Queue(maxsize=self.max_pending_events)
+        limit = self._limit(sandbox)
+        consumer_gone = False
+
+        async def put(event: Optional[Dict[str, Any]]):
+            if not consumer_gone:
+                await events.put(event)
+
+        def emit_for(call: Dict[str, Any]):
+            async def emit(event: str, data: Any):
+                await put({"event": event, "data": {"tool_call_id": call["id"], "name": call["tool"], **data}})
+            return emit
+
+        async def run(call: Dict[str, Any]):
+            tool = self.registry.get(call["tool"])
+            await put({"event": "tool", "data": {
+                "tool_call_id": call["id"], "name": call["tool"], "args": call["args"], "status": "calling",
+            }})
+            started = time.perf_counter()
+            outcome = "error"
+            try:
+                if tool is None:
+                    result = ToolResult(success=False, message=f"Unknown tool: {call['tool']}")
+                else:
+                    key = tool.resource(call["args"])
+                    lock = self._resource_lock(sandbox, key) if key else None
+                    context = ToolContext(session_id, sandbox, call["id"], emit_for(call), stop)
+                    if lock:
+                        await lock.acquire()
+                    try:
+                        async with limit:
+                            result = await tool.run(context, call["args"])
+                    finally:
+                        if lock:
+                            lock.release()
+                outcome = "success" if result.success else "failure"
+            except asyncio.TimeoutError:
+                outcome = "timeout"
+                result = ToolResult(success=False, message=f"Tool {call['tool']} timed out after {tool.timeout}s")
+            except asyncio.CancelledError:
+                outcome = "stopped"
+                result = ToolResult(success=False, message="Stopped")
+            except Exception as e:
+                logger.warning(f"Tool {call['tool']} failed: {e}")
+                result = ToolResult(success=False, message=f"Tool {call['tool']} failed: {e}")
+            # Includes the wait for the resource lock and the concurrency limit
+            TOOL_CALL_SECONDS.observe(
+                time.perf_counter() - started, tool=call["tool"] if tool else "unknown", outcome=outcome)
+            results[call["id"]] = result
+            await put({"event": "tool", "data": {
+                "tool_call_id": call["id"], "name": call["tool"], "args": call["args"],
+                "status": "called", "result": result.model_dump(),
+            }})
+
+        async def finish():
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await put(None)
+
+        tasks = [asyncio.create_task(run(call)) for call in calls]
+        finisher = asyncio.create_task(finish())
+        canceller = asyncio.create_task(stop.wait())
+        canceller.add_done_callback(lambda waiter: None if waiter.cancelled() else [task.cancel() for task in tasks])
+        try:
+            while True:
+                event = await events.get()
+                if event is None:
+                    break
+                yield event
+        finally:
+            # Tasks blocked on the full queue are woken by the cancellation and
+            # then stop emitting
+            consumer_gone = True
+            canceller.cancel()
+            finisher.cancel()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def run(self, session_id: str, sandbox: Sandbox, message: str, stop: asyncio.Event):
+        """
+        Generates the events answering one user message.
+        """
+        history = [
+            {"role": "system", "content": _SYSTEM_PROMPT.format(tools=self.registry.describe())},
+            {"role": "user", "content": message},
+        ]
+        for step in range(1, self.max_steps + 1):
+            reply = DeltaStream(self.llm.ask_stream(history))
+            try:
+                async for event in self._stream_reply(reply, stop):
+                    yield event
+            except Exception as e:
+                logger.error(f"LLM stream failed: {e}")
+                yield {"event": "error", "data": f"LLM request failed: {e}"}
+                break
+            if stop.is_set():
+                yield {"event": "message", "data": reply.text if not reply.text.lstrip().startswith("{") else ""}
+                break
+
+            decision = self._parse_reply(reply.text)
+            if decision is None:
+                yield {"event": "message", "data": reply.text}
+                break
+            if decision.get("plan"):
+                yield {"event": "plan", "data": {"steps": decision["plan"]}}
+            if decision.get("message"):
+                yield {"event": "message", "data": decision["message"]}
+            calls = decision["tool_calls"]
+            if not calls:
+                if not decision.get("message"):
+                    # A JSON answer that is neither a tool call nor a message
+                    # was held back from the deltas; hand it over as it is
+                    yield {"event": "message", "data": reply.text}
+                break
+
+            yield {"event": "step", "data": {"step": step, "status": "running", "tool_calls": [call["id"] for call in calls]}}
+            results: Dict[str, ToolResult] = {}
+            async for event in self._execute(session_id, sandbox, calls, stop, results):
+                yield event
+            yield {"event": "step", "data": {"step": step, "status": "stopped" if stop.is_set() else "completed"}}
+            if stop.is_set():
+                break
+
+            history.append({"role": "assistant", "content": reply.text})
+            history.append({"role": "user", "content": "Tool results: " + json.dumps({
+                call_id: result.model_dump() for call_id, result in results.items()
+            })})
+        else:
+            yield {"event": "error", "data": f"Stopped after {self.max_steps} steps without a final answer."}
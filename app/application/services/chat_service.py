@@ -1,68 +1,91 @@
+from typing import Any, Dict, Optional, Set
+import asyncio
 from app.application.services.session_service import SessionService
+from app.application.services.agent_executor import AgentExecutor
 from app.domain.external.llm import LLM
+from app.domain.services.builtin_tools import create_default_registry
+from app.domain.services.tool_registry import ToolRegistry
 from app.infrastructure.external.llm.gemini_llm import GeminiLLM
-import json
+from app.infrastructure.external.llm.instrumented_llm import InstrumentedLLM
+from app.infrastructure.metrics import ACTIVE_CHATS
 
 class ChatService:
     """
     Service for handling the chat logic within a session.
     """
 
-    def __init__(self, session_service: SessionService):
+    def __init__(self, session_service: SessionService, llm: Optional[LLM] = None,
+                 registry: Optional[ToolRegistry] = None, stop_poll_interval: float = 0.5):
         self.session_service = session_service
-        self.llm = GeminiLLM()
-        # In a real app, you'd have a more sophisticated way of managing tools
-        self.tools = ["navigate", "view_page", "exec_command", "file_write", "file_read"]
+        self.llm = InstrumentedLLM(llm or GeminiLLM())
+        self.registry = registry or create_default_registry()
+        self.executor = AgentExecutor(self.llm, self.registry)
+        # Stop signals of the chats this process runs in each session, for /stop
+        self._stops: Dict[str, Set[asyncio.Event]] = {}
+        # How often a running chat checks the store for a /stop sent to another worker
+        self.stop_poll_interval = stop_poll_interval
+
+    async def stop(self, session_id: str) -> bool:
+        """
+        Stops the chat running in a session: cancels the LLM generation and
+        any tool calls in flight. The chat may run in another worker, so the
+        request also goes through the session store. Returns False if no chat
+        is running in the session.
+        """
+        requested = await self.session_service.request_stop(session_id)
+        stops = self._stops.get(session_id, ())
+        for stop in stops:
+            stop.set()
+        return requested or bool(stops)
+
+    async def _watch_stop(self, session_id: str, stop: asyncio.Event):
+        while not stop.is_set():
+            await asyncio.sleep(self.stop_poll_interval)
+            if await self.session_service.stop_requested(session_id):
+                stop.set()
+
+    async def release(self, session_id: str):
+        """
+        Stops a deleted session's chat and drops its per-sandbox state.
+        """
+        await self.stop(session_id)
+        self.executor.release(session_id)
+
+    @staticmethod
+    def _persisted(event: Dict[str, Any]) -> bool:
+        if event["event"] == "message_delta":
+            return False
+        return not (event["event"] == "tool" and event["data"].get("status") == "output")
 
     async def chat(self, session_id: str, message: str):
         """
         Handles a chat message, orchestrates tool use, and generates a response.
         This will be a streaming response (SSE).
+        Every event except the token deltas and the output chunks of running
+        tools is appended to the session's log; a tool's result holds the tail
+        of its output.
         """
         sandbox = await self.session_service.get_session_sandbox(session_id)
-        
-        # This is a simplified conversation loop. A real implementation would be more complex.
-        yield {"event": "message", "data": "Thinking..."}
-
-        # 1. Send the initial prompt to the LLM to get a plan or tool call
-        initial_response = await self.llm.ask([
-            {"role": "system", "content": f"You are a helpful assistant with access to these tools: {', '.join(self.tools)}. Decide which tool to use."},
-            {"role": "user", "content": message}
-        ])
-        
-        # For simplicity, we'll assume the LLM returns a JSON with a tool call.
-        # A real implementation would need to parse the response more robustly.
+        await self.session_service.record_event(session_id, "user_message", message)
+        await self.session_service.update_status(session_id, "running")
+        stop = asyncio.Event()
+        self._stops.setdefault(session_id, set()).add(stop)
+        watcher = asyncio.create_task(self._watch_stop(session_id, stop))
+        ACTIVE_CHATS.inc()
         try:
-            tool_call = json.loads(initial_response["content"])
-            tool_name = tool_call.get("tool")
-            tool_args = tool_call.get("args", {})
-            
-            yield {"event": "tool", "data": json.dumps(tool_call)}
-
-            # 2. Execute the tool
-            if tool_name == "navigate":
-                browser = await sandbox.get_browser()
-                result = await browser.navigate(tool_args.get("url"))
-            elif tool_name == "view_page":
-                browser = await sandbox.get_browser()
-                result = await browser.view_page()
-            # ... other tool implementations ...
-            else:
-                result = {"success": False, "message": "Unknown tool"}
-
-            yield {"event": "tool_result", "data": json.dumps(result)}
-
-            # 3. Send the result back to the LLM for a final response
-            final_response = await self.llm.ask([
-                {"role": "user", "content": message},
-                {"role": "assistant", "content": json.dumps(tool_call)},
-                {"role": "user", "content": f"Tool result: {json.dumps(result)}"}
-            ])
-            
-            yield {"event": "message", "data": final_response["content"]}
-
-        except (json.JSONDecodeError, KeyError):
-            # If the LLM didn't return a tool call, just return its response.
-            yield {"event": "message", "data": initial_response["content"]}
-
-        yield {"event": "done", "data": ""}
+            # This is a simplified conversation loop. A real implementation would be more complex.
+            yield {"event": "message", "data": "Thinking..."}
+            async for event in self.executor.run(session_id, sandbox, message, stop):
+                if self._persisted(event):
+                    await self.session_service.record_event(session_id, event["event"], event["data"])
+                yield event
+            yield {"event": "done", "data": ""}
+            await self.session_service.record_event(session_id, "done", "")
+        finally:
+            watcher.cancel()
+            ACTIVE_CHATS.dec()
+            stops = self._stops.get(session_id, set())
+            stops.discard(stop)
+            if not stops:
+                self._stops.pop(session_id, None)
+                await self.session_service.update_status(session_id, "completed")
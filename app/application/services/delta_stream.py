@@ -0,0 +1,70 @@
+from typing import AsyncIterator, List, Optional
+import asyncio
+
+class DeltaStream:
+    """
+    Pulls text deltas from an LLM stream in a background task and hands them
+    to a (possibly slow) consumer.
+
+    While the consumer is busy, pending deltas are merged into a single chunk.
+    Once `max_pending_chars` are buffered the producer stops pulling, which
+    pushes backpressure to the upstream generation. `cancel()` stops the
+    upstream generation; the consumer then sees the end of the stream.
+    """
+
+    def __init__(self, source: AsyncIterator[str], max_pending_chars: int = 4096):
+        self._source = source
+        self._max_pending_chars = max_pending_chars
+        self._pending: List[str] = []
+        self._pending_chars = 0
+        self._finished = False
+        self._error: Optional[BaseException] = None
+        self._changed = asyncio.Condition()
+        self._task: Optional[asyncio.Task] = None
+        self.cancelled = False
+        self.text = ""
+
+    def cancel(self):
+        """Stops the upstream generation."""
+        self.cancelled = True
+        if self._task:
+            self._task.cancel()
+
+    async def _pump(self):
+        try:
+            async for delta in self._source:
+                async with self._changed:
+                    await self._changed.wait_for(lambda: self._pending_chars < self._max_pending_chars)
+                    self._pending.append(delta)
+                    self._pending_chars += len(delta)
+                    self._changed.notify_all()
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            self._error = e
+        finally:
+            async with self._changed:
+                self._finished = True
+                self._changed.notify_all()
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        if self.cancelled:
+            return
+        self._task = asyncio.create_task(self._pump())
+        try:
+            while True:
+                async with self._changed:
+                    await self._changed.wait_for(lambda: self._pending or self._finished)
+                    if not self._pending:
+                        break
+                    chunk = "".join(self._pending)
+                    self._pending.clear()
+                    self._pending_chars = 0
+                    self._changed.notify_all()
+                self.text += chunk
+                yield chunk
+            if self._error:
+                raise self._error
+        finally:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
@@ -1,14 +1,28 @@
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import os
+from docker.errors import NotFound
 from app.domain.external.sandbox import Sandbox
-from app.infrastructure.external.sandbox.docker_sandbox import DockerSandbox
+from app.domain.models.session import Session, SessionEvent
+from app.domain.repositories.session_repository import SessionRepository
+from app.infrastructure.external.sandbox.docker_sandbox import DockerSandbox, get_docker_control
+from app.infrastructure.repositories.sqlite_session_repository import SqliteSessionRepository
 
 class SessionService:
     """
     Service for managing conversation sessions.
     """
 
-    # In a real application, you would have a repository to store session state.
-    # For this example, we'll just manage the sandbox.
-    _active_sandboxes = {}
+    def __init__(self, repository: Optional[SessionRepository] = None):
+        # Session state lives in the repository so every worker process sees it;
+        # this process only caches its open connections to the sandboxes.
+        self.repository = repository or SqliteSessionRepository(os.environ.get("SESSION_DB_PATH", "sheikhbox.db"))
+        self._sandboxes: Dict[str, Sandbox] = {}
+
+    @property
+    def active_sessions(self) -> int:
+        """Sessions whose sandbox this process holds a connection to."""
+        return len(self._sandboxes)
 
     async def create_session(self) -> str:
         """
@@ -16,36 +30,128 @@ class SessionService:
         Returns the session ID (which is the sandbox ID in this case).
         """
         sandbox = await DockerSandbox.create()
-        self._active_sandboxes[sandbox.id] = sandbox
+        await self.repository.create(Session(
+            session_id=sandbox.id,
+            sandbox_id=sandbox.id,
+            sandbox_ip=sandbox.ip,
+        ))
+        self._sandboxes[sandbox.id] = sandbox
         return sandbox.id
 
+    async def get_session(
+        self, session_id: str, after_event_id: int = 0, limit: int = 1000,
+    ) -> Tuple[Session, List[SessionEvent], Optional[int]]:
+        """
+        Gets a session with up to `limit` of its events after `after_event_id`
+        and marks its messages as read. Also returns the cursor to pass as
+        `after_event_id` for the next page, or None on the last page.
+        """
+        session = await self.repository.get(session_id)
+        if session is None:
+            raise ValueError("Session not found")
+        events = await self.repository.get_events(session_id, after_event_id=after_event_id, limit=limit + 1)
+        next_event_id = None
+        if len(events) > limit:
+            events = events[:limit]
+            next_event_id = events[-1].event_id
+        await self.repository.mark_read(session_id)
+        return session, events, next_event_id
+
+    async def list_sessions(self, limit: int = 50, offset: int = 0) -> List[Session]:
+        """
+        Lists sessions, the one with the most recent message first.
+        """
+        return await self.repository.list(limit=limit, offset=offset)
+
     async def get_session_sandbox(self, session_id: str) -> Sandbox:
         """
         Gets the sandbox associated with a session.
+        The sandbox's address is resolved through the Docker control plane on
+        every call instead of being trusted from the store: containers are
+        removed when they exit and their IP may since belong to another
+        session's sandbox. A session whose container is gone is marked ended.
         """
-        if session_id in self._active_sandboxes:
-            return self._active_sandboxes[session_id]
-        
-        # In a real app, you might try to reconnect to an existing container
+        sandbox = self._sandboxes.get(session_id)
+        if sandbox is not None:
+            sandbox_id = sandbox.id
+        else:
+            session = await self.repository.get(session_id)
+            if session is None:
+                raise ValueError("Session not found")
+            sandbox_id = session.sandbox_id
+
         try:
-            sandbox = await DockerSandbox.get(session_id)
-            self._active_sandboxes[session_id] = sandbox
-            return sandbox
-        except Exception:
-            raise ValueError("Session not found")
+            info = await get_docker_control().inspect(sandbox_id)
+        except NotFound:
+            info = None
+        if info is None or not info.running or not info.ip:
+            self._sandboxes.pop(session_id, None)
+            if sandbox is not None:
+                await sandbox.close()
+            await self.repository.update_status(session_id, "ended")
+            raise ValueError("Session sandbox is no longer running")
+
+        if sandbox is None or sandbox.ip != info.ip:
+            if sandbox is not None:
+                await sandbox.close()
+            # The session may have been created by another worker
+            sandbox = DockerSandbox(ip=info.ip, container_name=sandbox_id)
+            self._sandboxes[session_id] = sandbox
+        return sandbox
+
+    async def record_event(self, session_id: str, event: str, data: Any):
+        """
+        Appends an event to the session's log.
+        """
+        await self.repository.append_event(SessionEvent(session_id=session_id, event=event, data=data))
+
+    async def update_status(self, session_id: str, status: str):
+        await self.repository.update_status(session_id, status)
+
+    async def request_stop(self, session_id: str) -> bool:
+        """
+        Asks the worker running a session's chat to stop it. Returns False if
+        no chat is running in the session.
+        """
+        return await self.repository.request_stop(session_id)
+
+    async def stop_requested(self, session_id: str) -> bool:
+        session = await self.repository.get(session_id)
+        return session is not None and session.status == "stopping"
 
     async def delete_session(self, session_id: str):
         """
         Deletes a session and its associated sandbox.
         """
-        if session_id in self._active_sandboxes:
-            sandbox = self._active_sandboxes.pop(session_id)
-            await sandbox.destroy()
-        else:
-            # Try to delete even if not in active memory
-            try:
-                sandbox = await DockerSandbox.get(session_id)
-                await sandbox.destroy()
-            except Exception:
-                # Session might have already been deleted
-                pass
+        if await self.repository.get(session_id) is None:
+            raise ValueError("Session not found")
+        await self.delete_sessions([session_id])
+
+    async def delete_sessions(self, session_ids: List[str]) -> Dict[str, bool]:
+        """
+        Deletes many sessions at once, tearing their sandboxes down concurrently.
+        Only the sandboxes of stored sessions are touched; unknown IDs are
+        reported as not deleted.
+        """
+        session_ids = list(dict.fromkeys(session_ids))
+        sessions = [
+            session for session in await asyncio.gather(*(self.repository.get(id) for id in session_ids))
+            if session is not None
+        ]
+        found = [session.session_id for session in sessions]
+        sandboxes = [self._sandboxes.pop(id) for id in found if id in self._sandboxes]
+        await asyncio.gather(*(sandbox.close() for sandbox in sandboxes))
+        await self.repository.delete(found)
+        removed = await DockerSandbox.destroy_many([session.sandbox_id for session in sessions])
+        results = {id: False for id in session_ids}
+        results.update({session.session_id: removed[session.sandbox_id] for session in sessions})
+        return results
+
+    async def close(self):
+        """
+        Releases the sandbox connections of this process and flushes the store.
+        """
+        sandboxes = list(self._sandboxes.values())
+        self._sandboxes.clear()
+        await asyncio.gather(*(sandbox.close() for sandbox in sandboxes), return_exceptions=True)
+        await self.repository.close()
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
+from typing import AsyncIterator, List, Dict, Any
 
 class LLM(ABC):
     """
@@ -12,3 +12,11 @@ class LLM(ABC):
         Sends a request to the LLM and gets a response.
         """
         pass
+
+    @abstractmethod
+    def ask_stream(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """
+        Sends a request to the LLM and yields the response text incrementally.
+        Closing the iterator cancels the upstream generation.
+        """
+        pass
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import BinaryIO, Optional
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, BinaryIO, Callable, Dict, List, Optional
 from app.domain.models.tool_result import ToolResult
 from app.domain.external.browser import Browser
 
@@ -31,14 +31,38 @@ class Sandbox(ABC):
         """Destroys the sandbox and cleans up resources."""
         pass
 
+    @abstractmethod
+    async def close(self):
+        """Releases this process's connections to the sandbox, leaving it running."""
+        pass
+
+    @abstractmethod
+    async def is_ready(self) -> bool:
+        """Checks whether the services inside the sandbox are responding."""
+        pass
+
     @abstractmethod
     async def get_browser(self) -> Browser:
         """Gets a browser instance within the sandbox."""
         pass
 
     @abstractmethod
-    async def exec_command(self, session_id: str, exec_dir: str, command: str) -> ToolResult:
-        """Executes a shell command."""
+    async def exec_command(
+        self, session_id: str, exec_dir: str, command: str,
+        on_output: Optional[Callable[[str, str], Awaitable[None]]] = None,
+    ) -> ToolResult:
+        """
+        Executes a shell command.
+        `on_output(stream, data)` is called with stdout/stderr as they are produced.
+        """
+        pass
+
+    @abstractmethod
+    async def kill_command(self, session_id: str, exec_id: Optional[str] = None) -> bool:
+        """
+        Kills a running command, or every command of the session if `exec_id`
+        is None. Returns whether anything was killed.
+        """
         pass
 
     @abstractmethod
@@ -46,7 +70,22 @@ class Sandbox(ABC):
         """Writes content to a file."""
         pass
 
+    @abstractmethod
+    async def file_write_stream(self, file: str, chunks: AsyncIterable[bytes]) -> ToolResult:
+        """Writes a file from a stream of chunks without holding it in memory."""
+        pass
+
     @abstractmethod
     async def file_read(self, file: str) -> ToolResult:
         """Reads content from a file."""
         pass
+
+    @abstractmethod
+    def file_read_stream(self, file: str) -> AsyncIterator[bytes]:
+        """Reads a file as a stream of chunks."""
+        pass
+
+    @abstractmethod
+    async def file_batch(self, operations: List[Dict[str, Any]]) -> ToolResult:
+        """Reads and writes many files in one round trip; reads are capped like file_read."""
+        pass
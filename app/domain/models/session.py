@@ -0,0 +1,27 @@
+from pydantic import BaseModel
+from typing import Any, Optional
+
+class Session(BaseModel):
+    """
+    Represents a conversation session and the sandbox it runs in.
+    """
+    session_id: str
+    title: str = ""
+    status: str = "pending"
+    sandbox_id: Optional[str] = None
+    sandbox_ip: Optional[str] = None
+    latest_message: str = ""
+    latest_message_at: int = 0
+    unread_message_count: int = 0
+    created_at: int = 0
+    updated_at: int = 0
+
+class SessionEvent(BaseModel):
+    """
+    An event of a session's append-only log, as streamed to the client.
+    """
+    event_id: Optional[int] = None
+    session_id: str
+    event: str
+    data: Any = None
+    created_at: int = 0
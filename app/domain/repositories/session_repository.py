@@ -0,0 +1,61 @@
+from abc import ABC, abstractmethod
+from typing import List, Optional
+from app.domain.models.session import Session, SessionEvent
+
+class SessionRepository(ABC):
+    """
+    Abstract base class defining the interface for session storage.
+    """
+
+    @abstractmethod
+    async def create(self, session: Session) -> Session:
+        """Stores a new session."""
+        pass
+
+    @abstractmethod
+    async def get(self, session_id: str) -> Optional[Session]:
+        """Gets a session by its ID."""
+        pass
+
+    @abstractmethod
+    async def list(self, limit: int = 50, offset: int = 0) -> List[Session]:
+        """Lists sessions, most recent message first."""
+        pass
+
+    @abstractmethod
+    async def update_status(self, session_id: str, status: str):
+        """Updates the status of a session."""
+        pass
+
+    @abstractmethod
+    async def request_stop(self, session_id: str) -> bool:
+        """
+        Moves a running session to the "stopping" status, so whichever worker
+        runs its chat stops it. Returns False if the session is not running.
+        """
+        pass
+
+    @abstractmethod
+    async def mark_read(self, session_id: str):
+        """Resets the unread message count of a session."""
+        pass
+
+    @abstractmethod
+    async def delete(self, session_ids: List[str]):
+        """Deletes sessions together with their events."""
+        pass
+
+    @abstractmethod
+    async def append_event(self, event: SessionEvent):
+        """Appends an event to a session's log. Writes may be batched."""
+        pass
+
+    @abstractmethod
+    async def get_events(self, session_id: str, after_event_id: int = 0, limit: int = 1000) -> List[SessionEvent]:
+        """Gets a session's events in order."""
+        pass
+
+    @abstractmethod
+    async def close(self):
+        """Flushes pending writes and releases the store."""
+        pass
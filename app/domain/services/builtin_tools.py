@@ -0,0 +1,59 @@
+from app.domain.models.tool_result import ToolResult
+from app.domain.services.tool_registry import Tool, ToolContext, ToolRegistry
+
+async def navigate(context: ToolContext, url: str) -> ToolResult:
+    browser = await context.sandbox.get_browser()
+    return await browser.navigate(url)
+
+async def view_page(context: ToolContext) -> ToolResult:
+    browser = await context.sandbox.get_browser()
+    return await browser.view_page()
+
+async def exec_command(context: ToolContext, command: str, exec_dir: str = "/home") -> ToolResult:
+    async def on_output(stream: str, data: str):
+        await context.emit("tool", {"status": "output", "stream": stream, "data": data})
+    return await context.sandbox.exec_command(context.session_id, exec_dir, command, on_output=on_output)
+
+async def file_write(context: ToolContext, file: str, content: str) -> ToolResult:
+    return await context.sandbox.file_write(file, content)
+
+async def file_read(context: ToolContext, file: str) -> ToolResult:
+    return await context.sandbox.file_read(file)
+
+async def file_read_many(context: ToolContext, files: list) -> ToolResult:
+    return await context.sandbox.file_batch([{"op": "read", "path": file} for file in files])
+
+def _file_resource(args) -> str:
+    return f"file:{args.get('file')}"
+
+def create_default_registry() -> ToolRegistry:
+    """
+    Creates a registry with the browser, shell and file tools.
+    """
+    registry = ToolRegistry()
+    # The sandbox has a single browser page, so browser calls are serialized
+    registry.register(Tool(
+        "navigate", "Opens a URL in the sandbox browser.",
+        {"url": "string"}, navigate, resource="browser", timeout=90,
+    ))
+    registry.register(Tool(
+        "view_page", "Returns the content of the current browser page as Markdown.",
+        {}, view_page, resource="browser", timeout=120,
+    ))
+    registry.register(Tool(
+        "exec_command", "Runs a shell command in the sandbox and returns its output.",
+        {"command": "string", "exec_dir": "string (optional)"}, exec_command, timeout=600,
+    ))
+    registry.register(Tool(
+        "file_write", "Writes text content to a file in the sandbox.",
+        {"file": "string", "content": "string"}, file_write, resource=_file_resource, timeout=120,
+    ))
+    registry.register(Tool(
+        "file_read", "Reads a text file from the sandbox.",
+        {"file": "string"}, file_read, resource=_file_resource, timeout=120,
+    ))
+    registry.register(Tool(
+        "file_read_many", "Reads several text files from the sandbox in one go.",
+        {"files": "list of strings"}, file_read_many, timeout=120,
+    ))
+    return registry
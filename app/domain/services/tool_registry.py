@@ -0,0 +1,94 @@
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+import asyncio
+from app.domain.external.sandbox import Sandbox
+from app.domain.models.tool_result import ToolResult
+
+class ToolContext:
+    """
+    What a tool handler gets besides its arguments: the session's sandbox,
+    a way to stream progress events, and the stop signal of the run.
+    """
+
+    def __init__(
+        self,
+        session_id: str,
+        sandbox: Sandbox,
+        tool_call_id: str = "",
+        emit: Optional[Callable[[str, Any], Awaitable[None]]] = None,
+        stop: Optional[asyncio.Event] = None,
+    ):
+        self.session_id = session_id
+        self.sandbox = sandbox
+        self.tool_call_id = tool_call_id
+        self._emit = emit
+        self.stop = stop or asyncio.Event()
+
+    @property
+    def stopped(self) -> bool:
+        return self.stop.is_set()
+
+    async def emit(self, event: str, data: Any):
+        """Streams an intermediate event of this tool call to the client."""
+        if self._emit:
+            await self._emit(event, data)
+
+class Tool:
+    """
+    A tool the agent can call.
+
+    Calls whose `resource` key is equal run one after another in the order
+    the LLM issued them (e.g. everything touching the single browser page),
+    also across concurrent chats in the same sandbox; all other calls of one
+    LLM turn may run concurrently.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        parameters: Dict[str, str],
+        handler: Callable[..., Awaitable[ToolResult]],
+        resource: Union[None, str, Callable[[Dict[str, Any]], Optional[str]]] = None,
+        timeout: float = 120,
+    ):
+        self.name = name
+        self.description = description
+        self.parameters = parameters
+        self.handler = handler
+        self._resource = resource
+        self.timeout = timeout
+
+    def resource(self, args: Dict[str, Any]) -> Optional[str]:
+        """Returns the key of what a call with these arguments needs exclusively."""
+        if callable(self._resource):
+            return self._resource(args)
+        return self._resource
+
+    async def run(self, context: ToolContext, args: Dict[str, Any]) -> ToolResult:
+        return await asyncio.wait_for(self.handler(context, **args), timeout=self.timeout)
+
+class ToolRegistry:
+    """
+    The tools available to the agent, by name.
+    """
+
+    def __init__(self):
+        self._tools: Dict[str, Tool] = {}
+
+    def register(self, tool: Tool) -> Tool:
+        self._tools[tool.name] = tool
+        return tool
+
+    def get(self, name: str) -> Optional[Tool]:
+        return self._tools.get(name)
+
+    def names(self) -> List[str]:
+        return list(self._tools)
+
+    def describe(self) -> str:
+        """Describes every tool for the system prompt."""
+        lines = []
+        for tool in self._tools.values():
+            params = ", ".join(f"{name}: {kind}" for name, kind in tool.parameters.items())
+            lines.append(f"- {tool.name}({params}): {tool.description}")
+        return "\n".join(lines)
@@ -0,0 +1,102 @@
+from typing import Callable, Dict, List, Optional
+import asyncio
+import logging
+import os
+import time
+from app.infrastructure.external.browser.fake_browser import FakeBrowser
+from app.infrastructure.external.browser.playwright_browser import PlaywrightBrowser
+
+logger = logging.getLogger(__name__)
+
+class _CachedBrowser:
+    def __init__(self, browser: PlaywrightBrowser):
+        self.browser = browser
+        self.last_used = time.monotonic()
+
+class BrowserConnectionCache:
+    """
+    Keeps one warm CDP connection per sandbox so consecutive browser tool
+    calls reuse the same connection and page.
+
+    Connections idle for longer than `idle_timeout` seconds are dropped; the
+    browser inside the sandbox keeps running and is reconnected on next use.
+    Idleness counts from the end of the browser's last operation, and a
+    connection with an operation in flight is never dropped.
+    """
+
+    def __init__(self, idle_timeout: float = 300, sweep_interval: float = 60,
+                 browser_factory: Callable[[str], PlaywrightBrowser] = PlaywrightBrowser):
+        self._idle_timeout = idle_timeout
+        self._sweep_interval = sweep_interval
+        self._browsers: Dict[str, _CachedBrowser] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._browser_factory = browser_factory
+
+    def get(self, sandbox_id: str, cdp_url: str) -> PlaywrightBrowser:
+        """Returns the cached browser for a sandbox, creating it if needed."""
+        entry = self._browsers.get(sandbox_id)
+        if entry is None or entry.browser.cdp_url != cdp_url:
+            if entry is not None:
+                self._disconnect_later(entry.browser)
+            entry = _CachedBrowser(self._browser_factory(cdp_url))
+            self._browsers[sandbox_id] = entry
+        entry.last_used = time.monotonic()
+        return entry.browser
+
+    async def release(self, sandbox_id: str):
+        """Disconnects and forgets the browser of a sandbox that is going away."""
+        entry = self._browsers.pop(sandbox_id, None)
+        if entry is not None:
+            await entry.browser.disconnect()
+
+    async def evict_idle(self) -> List[str]:
+        """Disconnects every browser that has not been used within the idle timeout."""
+        now = time.monotonic()
+        expired = [
+            sandbox_id for sandbox_id, entry in self._browsers.items()
+            if not entry.browser.busy
+            and now - max(entry.last_used, entry.browser.last_used) > self._idle_timeout
+        ]
+        browsers = [self._browsers.pop(sandbox_id).browser for sandbox_id in expired]
+        await asyncio.gather(*(browser.disconnect() for browser in browsers), return_exceptions=True)
+        return expired
+
+    async def start(self):
+        """Start the background task that evicts idle connections."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._sweep())
+
+    async def close(self):
+        """Stop evicting and disconnect every cached browser."""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        browsers = [entry.browser for entry in self._browsers.values()]
+        self._browsers.clear()
+        await asyncio.gather(*(browser.disconnect() for browser in browsers), return_exceptions=True)
+
+    def _disconnect_later(self, browser: PlaywrightBrowser):
+        asyncio.get_running_loop().create_task(browser.disconnect())
+
+    async def _sweep(self):
+        while True:
+            await asyncio.sleep(self._sweep_interval)
+            try:
+                evicted = await self.evict_idle()
+                if evicted:
+                    logger.info(f"Evicted idle browser connections: {', '.join(evicted)}")
+            except Exception as e:
+                logger.error(f"Browser connection sweep failed: {e}")
+
+def _browser_factory() -> Callable[[str], PlaywrightBrowser]:
+    # BROWSER_BACKEND=fake swaps CDP for FakeBrowser, for offline runs and benchmarks
+    if os.environ.get("BROWSER_BACKEND") == "fake":
+        latency = float(os.environ.get("FAKE_BROWSER_LATENCY", "0"))
+        return lambda cdp_url: FakeBrowser(cdp_url, latency=latency)
+    return PlaywrightBrowser
+
+_browser_cache = BrowserConnectionCache(browser_factory=_browser_factory())
+
+def get_browser_cache() -> BrowserConnectionCache:
+    return _browser_cache
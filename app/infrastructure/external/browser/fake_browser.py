@@ -0,0 +1,57 @@
+from typing import Optional
+import asyncio
+import time
+from app.domain.external.browser import Browser
+from app.domain.models.tool_result import ToolResult
+
+class FakeBrowser(Browser):
+    """
+    CDP-free stand-in for PlaywrightBrowser. Every operation sleeps `latency`
+    seconds and returns canned content, so browser tool calls can be
+    exercised and benchmarked without a Chromium in the sandbox.
+    """
+
+    def __init__(self, cdp_url: str, latency: float = 0.0):
+        self.cdp_url = cdp_url
+        self.latency = latency
+        self.url: Optional[str] = None
+        self.calls = 0
+        self.busy = False
+        self.last_used = time.monotonic()
+
+    async def _delay(self):
+        self.calls += 1
+        self.busy = True
+        try:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+        finally:
+            self.busy = False
+            self.last_used = time.monotonic()
+
+    async def navigate(self, url: str) -> ToolResult:
+        await self._delay()
+        self.url = url
+        return ToolResult(success=True, message=f"Navigated to {url}")
+
+    async def click(self, index: int) -> ToolResult:
+        await self._delay()
+        return ToolResult(success=True)
+
+    async def input(self, text: str, index: int, press_enter: bool) -> ToolResult:
+        await self._delay()
+        return ToolResult(success=True)
+
+    async def view_page(self) -> ToolResult:
+        await self._delay()
+        return ToolResult(success=True, data={"content": f"# Fake page\n\nContent of {self.url or 'about:blank'}."})
+
+    async def screenshot(self) -> bytes:
+        await self._delay()
+        return b""
+
+    async def disconnect(self):
+        self.url = None
+
+    async def cleanup(self):
+        await self.disconnect()
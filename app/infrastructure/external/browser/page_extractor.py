@@ -0,0 +1,127 @@
+from typing import Iterator, List, Optional, Tuple, Union
+from collections import OrderedDict
+import hashlib
+import re
+from bs4 import BeautifulSoup, Comment, NavigableString, Tag
+from markdownify import MarkdownConverter
+
+# Runs inside the page. Builds a pruned copy of the body without touching the
+# live DOM: scripts, styles, SVG and hidden nodes are skipped, attributes other
+# than links/alt text are dropped, and traversal stops once `textBudget`
+# characters of text have been collected.
+PRUNE_PAGE_SCRIPT = """
+([textBudget, maxHtmlChars]) => {
+    const SKIP = new Set(["SCRIPT", "STYLE", "NOSCRIPT", "SVG", "TEMPLATE", "IFRAME",
+                          "OBJECT", "EMBED", "CANVAS", "LINK", "META"]);
+    const KEEP_ATTRS = new Set(["href", "src", "alt", "title"]);
+    let budget = textBudget;
+    const isHidden = (el) => {
+        if (el.hidden || el.getAttribute("aria-hidden") === "true") return true;
+        const style = getComputedStyle(el);
+        return style.display === "none" || style.visibility === "hidden";
+    };
+    const prune = (src) => {
+        const copy = src.cloneNode(false);
+        for (const name of copy.getAttributeNames()) {
+            if (!KEEP_ATTRS.has(name)) copy.removeAttribute(name);
+        }
+        for (const child of src.childNodes) {
+            if (budget <= 0) break;
+            if (child.nodeType === Node.TEXT_NODE) {
+                budget -= child.textContent.trim().length;
+                copy.appendChild(child.cloneNode(false));
+            } else if (child.nodeType === Node.ELEMENT_NODE
+                       && !SKIP.has(child.tagName.toUpperCase()) && !isHidden(child)) {
+                copy.appendChild(prune(child));
+            }
+        }
+        return copy;
+    };
+    const html = document.body ? prune(document.body).outerHTML : "";
+    return {url: location.href, html: html.slice(0, maxHtmlChars)};
+}
+"""
+
+# Tags that carry no Markdown of their own; the converter descends into them
+# so it can stop after any child once the budget is used up.
+_CONTAINER_TAGS = {
+    "html", "body", "div", "section", "main", "article", "header", "footer", "nav", "aside", "form",
+}
+
+# Tags rendered inline; other tags are separated from their neighbours by a blank line
+_INLINE_TAGS = {
+    "a", "abbr", "b", "br", "code", "em", "i", "img", "kbd", "label", "s", "small", "span",
+    "strong", "sub", "sup", "u",
+}
+
+def _iter_blocks(node: Tag) -> Iterator[Optional[Union[Tag, NavigableString]]]:
+    """Yields convertible blocks in document order, and None at the end of each container."""
+    for child in list(node.children):
+        if isinstance(child, Comment):
+            continue
+        if isinstance(child, Tag) and child.name in _CONTAINER_TAGS:
+            yield from _iter_blocks(child)
+            yield None
+        else:
+            yield child
+
+def html_to_markdown(html: str, max_chars: int) -> str:
+    """
+    Converts HTML to Markdown block by block, stopping as soon as `max_chars`
+    characters have been produced. CPU-bound; call it off the event loop.
+    """
+    converter = MarkdownConverter()
+    soup = BeautifulSoup(html, "html.parser")
+    parts: List[str] = []
+    total = 0
+    for block in _iter_blocks(soup):
+        if block is None:
+            parts.append("\n\n")
+            continue
+        holder = BeautifulSoup("", "html.parser")
+        holder.append(block.extract())
+        markdown = converter.convert_soup(holder)
+        if isinstance(block, Tag) and block.name not in _INLINE_TAGS:
+            markdown = f"\n\n{markdown}\n\n"
+        parts.append(markdown)
+        total += len(markdown)
+        if total >= max_chars:
+            break
+    markdown = re.sub(r"\n\s*\n(\s*\n)+", "\n\n", "".join(parts)).strip()
+    return markdown[:max_chars]
+
+def content_hash(html: str) -> str:
+    return hashlib.sha256(html.encode("utf-8")).hexdigest()
+
+class PageContentCache:
+    """
+    LRU cache of extracted page content keyed by URL and content hash, so an
+    unchanged page is not converted and sent to the LLM again.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self._max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, url: str, page_hash: str) -> Optional[str]:
+        key = (url, page_hash)
+        content = self._entries.get(key)
+        if content is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return content
+
+    def put(self, url: str, page_hash: str, content: str):
+        self._entries[(url, page_hash)] = content
+        self._entries.move_to_end((url, page_hash))
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+_page_content_cache = PageContentCache()
+
+def get_page_content_cache() -> PageContentCache:
+    return _page_content_cache
@@ -1,9 +1,14 @@
-from typing import Dict, Any, Optional, List
-from playwright.async_api import async_playwright, Browser, Page
+from typing import AsyncIterator, Dict, Any, Optional, List
+from contextlib import asynccontextmanager
+from playwright.async_api import Browser, Page
 import asyncio
-from markdownify import markdownify
+import time
 from app.domain.external.llm import LLM
 from app.domain.models.tool_result import ToolResult
+from app.infrastructure.external.browser.playwright_driver import PlaywrightDriver, get_playwright_driver
+from app.infrastructure.external.browser.page_extractor import (
+    PRUNE_PAGE_SCRIPT, content_hash, get_page_content_cache, html_to_markdown,
+)
 import logging
 
 # A placeholder for a real LLM implementation
@@ -12,35 +17,46 @@ class PlaceholderLLM(LLM):
         # In a real scenario, this would call the Gemini API
         return {"content": messages[-1].get("content", "")}
 
+    async def ask_stream(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        yield messages[-1].get("content", "")
+
 logger = logging.getLogger(__name__)
 
+# Size budget of the Markdown handed to the extraction LLM
+MAX_PAGE_MARKDOWN_CHARS = 20000
+# Hard cap on the pruned HTML serialized in the browser
+MAX_PAGE_HTML_CHARS = 500000
+
 class PlaywrightBrowser:
     """Playwright client that provides specific implementation of browser operations"""
     
-    def __init__(self, cdp_url: str):
+    def __init__(self, cdp_url: str, driver: Optional[PlaywrightDriver] = None):
         self.browser: Optional[Browser] = None
         self.page: Optional[Page] = None
-        self.playwright = None
+        self.driver = driver or get_playwright_driver()
         self.llm = PlaceholderLLM() # Using a placeholder for now
         self.cdp_url = cdp_url
-        
+        self._lock = asyncio.Lock()
+        self._active = 0
+        self.last_used = time.monotonic()
+
+    @property
+    def busy(self) -> bool:
+        """Whether an operation is in flight on this connection."""
+        return self._active > 0
+
     async def initialize(self):
         """Initialize and ensure resources are available"""
         max_retries = 5
         retry_delay = 1
         for attempt in range(max_retries):
             try:
-                self.playwright = await async_playwright().start()
-                self.browser = await self.playwright.chromium.connect_over_cdp(self.cdp_url)
-                contexts = self.browser.contexts
-                if contexts and contexts[0].pages:
-                    self.page = contexts[0].pages[0]
-                else:
-                    context = contexts[0] if contexts else await self.browser.new_context()
-                    self.page = await context.new_page()
+                playwright = await self.driver.get()
+                self.browser = await playwright.chromium.connect_over_cdp(self.cdp_url)
+                await self._attach_page()
                 return True
             except Exception as e:
-                await self.cleanup()
+                await self.disconnect()
                 if attempt == max_retries - 1:
                     logger.error(f"Initialization failed after {max_retries} retries: {e}")
                     return False
@@ -48,50 +64,92 @@ class PlaywrightBrowser:
                 logger.warning(f"Initialization failed, retrying in {retry_delay} seconds: {e}")
                 await asyncio.sleep(retry_delay)
 
+    async def _attach_page(self):
+        """Attach to the first open page of the connected browser, opening one if needed."""
+        contexts = self.browser.contexts
+        if contexts and contexts[0].pages:
+            self.page = contexts[0].pages[0]
+        else:
+            context = contexts[0] if contexts else await self.browser.new_context()
+            self.page = await context.new_page()
+
+    async def disconnect(self):
+        """Drop the CDP connection, leaving the sandbox browser and its pages running"""
+        try:
+            if self.browser:
+                await self.browser.close()
+        except Exception as e:
+            logger.error(f"Error during disconnect: {e}")
+        finally:
+            self.page = None
+            self.browser = None
+
     async def cleanup(self):
         """Clean up Playwright resources"""
         try:
             if self.page and not self.page.is_closed():
                 await self.page.close()
-            if self.browser:
-                await self.browser.close()
-            if self.playwright:
-                await self.playwright.stop()
         except Exception as e:
             logger.error(f"Error during cleanup: {e}")
         finally:
-            self.page = None
-            self.browser = None
-            self.playwright = None
+            await self.disconnect()
     
-    async def _ensure_page(self):
-        """Ensure the browser and page are initialized."""
-        if not self.browser or not self.page or self.page.is_closed():
+    async def _ensure_page(self) -> Page:
+        """Ensure the browser and page are initialized, reusing a live connection."""
+        async with self._lock:
+            if self.browser and self.browser.is_connected():
+                if not self.page or self.page.is_closed():
+                    await self._attach_page()
+                return self.page
             if not await self.initialize():
                 raise Exception("Failed to initialize browser resources.")
+            return self.page
+
+    @asynccontextmanager
+    async def _use(self):
+        """Yields the page for one operation, keeping the connection busy so idle eviction skips it."""
+        self._active += 1
+        try:
+            yield await self._ensure_page()
+        finally:
+            self._active -= 1
+            self.last_used = time.monotonic()
 
     async def navigate(self, url: str, timeout: int = 60000) -> ToolResult:
-        await self._ensure_page()
+        async with self._use() as page:
+            return await self._navigate(page, url, timeout)
+
+    async def _navigate(self, page: Page, url: str, timeout: int) -> ToolResult:
         try:
-            await self.page.goto(url, timeout=timeout)
+            await page.goto(url, timeout=timeout)
             return ToolResult(success=True, data={"message": f"Navigated to {url}"})
         except Exception as e:
             return ToolResult(success=False, message=f"Failed to navigate to {url}: {e}")
 
     async def view_page(self) -> ToolResult:
-        await self._ensure_page()
+        async with self._use() as page:
+            return await self._view_page(page)
+
+    async def _view_page(self, page: Page) -> ToolResult:
         try:
-            content = await self.page.content()
-            html_content = await self.page.evaluate("document.body.outerHTML")
-            markdown_content = markdownify(html_content)
+            snapshot = await page.evaluate(PRUNE_PAGE_SCRIPT, [MAX_PAGE_MARKDOWN_CHARS, MAX_PAGE_HTML_CHARS])
+            page_hash = content_hash(snapshot["html"])
+            cache = get_page_content_cache()
+            cached = cache.get(snapshot["url"], page_hash)
+            if cached is not None:
+                return ToolResult(success=True, data={"content": cached})
+
+            markdown_content = await asyncio.to_thread(html_to_markdown, snapshot["html"], MAX_PAGE_MARKDOWN_CHARS)
             
             # Placeholder for content extraction with LLM
             extracted_content = await self.llm.ask([
                 {"role": "system", "content": "Extract all information from the page content and convert it to Markdown."},
-                {"role": "user", "content": markdown_content[:20000]}
+                {"role": "user", "content": markdown_content}
             ])
             
-            return ToolResult(success=True, data={"content": extracted_content.get("content", "")})
+            content = extracted_content.get("content", "")
+            cache.put(snapshot["url"], page_hash, content)
+            return ToolResult(success=True, data={"content": content})
         except Exception as e:
             return ToolResult(success=False, message=f"Failed to view page: {e}")
 
@@ -104,5 +162,5 @@ class PlaywrightBrowser:
         return ToolResult(success=False, message="Input by index is not fully implemented.")
 
     async def screenshot(self) -> bytes:
-        await self._ensure_page()
-        return await self.page.screenshot(type="png")
+        async with self._use() as page:
+            return await page.screenshot(type="png")
@@ -0,0 +1,40 @@
+from typing import Optional
+from playwright.async_api import async_playwright, Playwright
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+class PlaywrightDriver:
+    """
+    Owns the single Playwright driver (Node) process shared by every browser
+    connection in this process.
+    """
+
+    def __init__(self):
+        self._playwright: Optional[Playwright] = None
+        self._lock = asyncio.Lock()
+
+    async def get(self) -> Playwright:
+        """Returns the running driver, starting it on first use."""
+        if self._playwright is None:
+            async with self._lock:
+                if self._playwright is None:
+                    self._playwright = await async_playwright().start()
+        return self._playwright
+
+    async def stop(self):
+        """Stops the driver process."""
+        async with self._lock:
+            if self._playwright is not None:
+                try:
+                    await self._playwright.stop()
+                except Exception as e:
+                    logger.error(f"Error stopping Playwright driver: {e}")
+                finally:
+                    self._playwright = None
+
+_driver = PlaywrightDriver()
+
+def get_playwright_driver() -> PlaywrightDriver:
+    return _driver
@@ -0,0 +1,52 @@
+from typing import AsyncIterator, Callable, List, Dict, Any, Optional
+import asyncio
+from app.domain.external.llm import LLM
+
+class FakeLLM(LLM):
+    """
+    Offline LLM that replays scripted responses with configurable latency.
+    Used to measure time-to-first-byte and exercise streaming without Gemini.
+
+    Responses are returned round-robin, or computed from the conversation by
+    `responder` so concurrent sessions each follow their own script; without
+    either the last message is echoed.
+    """
+
+    def __init__(
+        self,
+        responses: Optional[List[str]] = None,
+        first_token_delay: float = 0.0,
+        token_delay: float = 0.0,
+        chunk_size: int = 4,
+        responder: Optional[Callable[[List[Dict[str, str]]], str]] = None,
+    ):
+        self.responses = responses or []
+        self.responder = responder
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.chunk_size = max(1, chunk_size)
+        self.calls = 0
+
+    def _next_response(self, messages: List[Dict[str, str]]) -> str:
+        self.calls += 1
+        if self.responder:
+            return self.responder(messages)
+        if not self.responses:
+            return messages[-1].get("content", "") if messages else ""
+        return self.responses[(self.calls - 1) % len(self.responses)]
+
+    def _chunks(self, text: str) -> List[str]:
+        return [text[i:i + self.chunk_size] for i in range(0, len(text), self.chunk_size)]
+
+    async def ask(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        text = self._next_response(messages)
+        await asyncio.sleep(self.first_token_delay + self.token_delay * len(self._chunks(text)))
+        return {"content": text}
+
+    async def ask_stream(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        text = self._next_response(messages)
+        await asyncio.sleep(self.first_token_delay)
+        for chunk in self._chunks(text):
+            yield chunk
+            if self.token_delay:
+                await asyncio.sleep(self.token_delay)
@@ -1,8 +1,11 @@
 import os
-from typing import List, Dict, Any
+import logging
+from typing import AsyncIterator, List, Dict, Any
 import google.generativeai as genai
 from app.domain.external.llm import LLM
 
+logger = logging.getLogger(__name__)
+
 class GeminiLLM(LLM):
     """
     Concrete implementation of the LLM interface for Google's Gemini API.
@@ -14,19 +17,43 @@ class GeminiLLM(LLM):
         genai.configure(api_key=api_key)
         self.model = genai.GenerativeModel('gemini-pro')
 
+    @staticmethod
+    def _build_prompt(messages: List[Dict[str, str]]) -> str:
+        # The Gemini API expects a list of contents, not a direct message list.
+        # We'll construct a simple conversation from the messages.
+        # This is a simplification; a real implementation would handle roles.
+        return "\n".join([msg["content"] for msg in messages if "content" in msg])
+
     async def ask(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
         """
         Sends a prompt to the Gemini API and returns the response.
         """
         try:
-            # The Gemini API expects a list of contents, not a direct message list.
-            # We'll construct a simple conversation from the messages.
-            # This is a simplification; a real implementation would handle roles.
-            prompt = "\n".join([msg["content"] for msg in messages if "content" in msg])
-            
-            response = await self.model.generate_content_async(prompt)
+            response = await self.model.generate_content_async(self._build_prompt(messages))
             return {"content": response.text}
         except Exception as e:
-            # In a real application, you'd have more robust error handling.
-            print(f"Error calling Gemini API: {e}")
+            logger.error(f"Error calling Gemini API: {e}")
             return {"content": f"An error occurred: {e}"}
+
+    @staticmethod
+    def _chunk_text(chunk) -> str:
+        # `chunk.text` raises on chunks without a text part (e.g. the final
+        # chunk that only carries the finish reason), so read the parts directly
+        feedback = getattr(chunk, "prompt_feedback", None)
+        if not chunk.candidates and feedback is not None and feedback.block_reason:
+            raise ValueError(f"Gemini blocked the prompt: {feedback}")
+        if not chunk.candidates:
+            return ""
+        return "".join(part.text for part in chunk.candidates[0].content.parts if part.text)
+
+    async def ask_stream(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """
+        Streams the Gemini response chunk by chunk.
+        Cancelling the consuming task cancels the underlying streaming call;
+        API errors are raised to the consumer.
+        """
+        response = await self.model.generate_content_async(self._build_prompt(messages), stream=True)
+        async for chunk in response:
+            text = self._chunk_text(chunk)
+            if text:
+                yield text
@@ -0,0 +1,29 @@
+from typing import AsyncIterator, List, Dict, Any
+import time
+from app.domain.external.llm import LLM
+from app.infrastructure.metrics import LLM_REQUEST_SECONDS, LLM_TIME_TO_FIRST_TOKEN_SECONDS
+
+class InstrumentedLLM(LLM):
+    """
+    Wraps any LLM and records its request latency and, for streamed
+    replies, the time to the first token.
+    """
+
+    def __init__(self, llm: LLM):
+        self.llm = llm
+
+    async def ask(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        with LLM_REQUEST_SECONDS.time(method="ask"):
+            return await self.llm.ask(messages)
+
+    async def ask_stream(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        started = time.perf_counter()
+        first = True
+        try:
+            async for chunk in self.llm.ask_stream(messages):
+                if first:
+                    LLM_TIME_TO_FIRST_TOKEN_SECONDS.observe(time.perf_counter() - started)
+                    first = False
+                yield chunk
+        finally:
+            LLM_REQUEST_SECONDS.observe(time.perf_counter() - started, method="ask_stream")
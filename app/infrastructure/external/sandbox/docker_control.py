@@ -0,0 +1,221 @@
+from typing import Any, Callable, Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import asyncio
+import logging
+import threading
+import time
+import docker
+from docker.errors import NotFound
+
+logger = logging.getLogger(__name__)
+
+class ContainerInfo:
+    """Cached state of a sandbox container."""
+
+    def __init__(self, name: str, id: str, status: str, ip: Optional[str]):
+        self.name = name
+        self.id = id
+        self.status = status
+        self.ip = ip
+
+    @property
+    def running(self) -> bool:
+        return self.status == "running"
+
+def _container_ip(attrs: Dict[str, Any]) -> Optional[str]:
+    network_settings = attrs.get('NetworkSettings') or {}
+    ip_address = network_settings.get('IPAddress')
+    if not ip_address and 'Networks' in network_settings:
+        for network_config in (network_settings['Networks'] or {}).values():
+            if network_config.get('IPAddress'):
+                ip_address = network_config['IPAddress']
+                break
+    return ip_address or None
+
+def _container_info(container) -> ContainerInfo:
+    status = (container.attrs.get('State') or {}).get('Status') or container.status
+    return ContainerInfo(container.name.lstrip('/'), container.id, status, _container_ip(container.attrs))
+
+class DockerControlPlane:
+    """
+    Async front for the Docker daemon shared by every sandbox in the process.
+
+    All SDK calls go through one client on a bounded thread pool so a slow
+    daemon never blocks the event loop. Container state and IPs are cached
+    and kept fresh from the Docker events stream, so lookups of running
+    sandboxes need no daemon round-trip.
+    """
+
+    def __init__(
+        self,
+        client_factory: Callable[[], Any] = docker.from_env,
+        label: Optional[str] = None,
+        max_workers: int = 8,
+    ):
+        self._client_factory = client_factory
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._label = label
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="docker")
+        self._containers: Dict[str, ContainerInfo] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._events = None
+        self._events_thread: Optional[threading.Thread] = None
+        self._events_live = False
+        self._stopping = False
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._client_factory()
+        return self._client
+
+    async def _run(self, fn: Callable, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(fn, *args, **kwargs))
+
+    def _cache(self, info: ContainerInfo) -> ContainerInfo:
+        self._containers[info.name] = info
+        return info
+
+    # --- Container operations ---
+
+    def _run_container_sync(self, config: Dict[str, Any]) -> ContainerInfo:
+        container = self.client.containers.run(**config)
+        container.reload()
+        return _container_info(container)
+
+    async def run_container(self, config: Dict[str, Any]) -> ContainerInfo:
+        """Starts a container from a `containers.run` config and caches its state."""
+        return self._cache(await self._run(self._run_container_sync, config))
+
+    def _inspect_sync(self, name: str) -> ContainerInfo:
+        return _container_info(self.client.containers.get(name))
+
+    async def inspect(self, name: str, refresh: bool = False) -> ContainerInfo:
+        """
+        Returns the state of a container, from the cache while the events
+        stream keeps it fresh. Raises docker.errors.NotFound if it does not exist.
+        """
+        info = self._containers.get(name)
+        if info is not None and info.running and self._events_live and not refresh:
+            return info
+        try:
+            return self._cache(await self._run(self._inspect_sync, name))
+        except NotFound:
+            self._containers.pop(name, None)
+            raise
+
+    def _remove_sync(self, name: str) -> bool:
+        try:
+            container = self.client.containers.get(name)
+        except NotFound:
+            return True
+        if self._label and self._label not in (container.labels or {}):
+            # `name` may be any name or ID prefix; never touch containers we did not start
+            logger.warning(f"Refusing to remove container {name}: it has no {self._label} label")
+            return False
+        try:
+            container.remove(force=True)
+        except NotFound:
+            pass
+        return True
+
+    async def remove(self, name: str) -> bool:
+        """
+        Force-removes a sandbox container; a container that is already gone
+        counts as removed. Containers without the sandbox label are left alone.
+        """
+        try:
+            removed = await self._run(self._remove_sync, name)
+            if removed:
+                self._containers.pop(name, None)
+            return removed
+        except Exception as e:
+            logger.error(f"Failed to remove container {name}: {e}")
+            return False
+
+    async def remove_many(self, names: List[str]) -> Dict[str, bool]:
+        """Removes many containers concurrently, bounded by the thread pool size."""
+        results = await asyncio.gather(*(self.remove(name) for name in names))
+        return dict(zip(names, results))
+
+    def cached(self) -> List[ContainerInfo]:
+        return list(self._containers.values())
+
+    # --- Events stream ---
+
+    async def start_events(self):
+        """Start following the Docker events stream to keep the cache fresh."""
+        if self._events_thread is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._stopping = False
+        self._events_thread = threading.Thread(target=self._follow_events, name="docker-events", daemon=True)
+        self._events_thread.start()
+
+    def _follow_events(self):
+        filters = {"type": "container"}
+        if self._label:
+            filters["label"] = self._label
+        while not self._stopping:
+            try:
+                self._events = self.client.events(decode=True, filters=filters)
+                self._events_live = True
+                for event in self._events:
+                    self._loop.call_soon_threadsafe(self._apply_event, event)
+            except Exception as e:
+                if not self._stopping:
+                    logger.warning(f"Docker events stream failed, reconnecting: {e}")
+            finally:
+                # Events may have been missed; fall back to inspecting until reconnected
+                self._events_live = False
+            if not self._stopping:
+                time.sleep(1)
+
+    def _apply_event(self, event: Dict[str, Any]):
+        action = event.get("Action") or event.get("status") or ""
+        actor = event.get("Actor") or {}
+        name = (actor.get("Attributes") or {}).get("name")
+        if not name:
+            return
+        info = self._containers.get(name)
+        if action == "destroy":
+            self._containers.pop(name, None)
+        elif action in ("start", "unpause", "restart"):
+            asyncio.ensure_future(self._refresh(name))
+        elif info is not None and action in ("die", "stop", "kill", "oom"):
+            info.status = "exited"
+            info.ip = None
+        elif info is not None and action == "pause":
+            info.status = "paused"
+
+    async def _refresh(self, name: str):
+        try:
+            await self.inspect(name, refresh=True)
+        except NotFound:
+            pass
+        except Exception as e:
+            logger.warning(f"Failed to refresh container {name}: {e}")
+
+    async def close(self):
+        """Stop following events and release the client and worker threads."""
+        self._stopping = True
+        if self._events is not None:
+            try:
+                self._events.close()
+            except Exception:
+                pass
+        if self._events_thread is not None:
+            await asyncio.to_thread(self._events_thread.join, 5)
+            self._events_thread = None
+        self._executor.shutdown(wait=False)
+        if self._client is not None:
+            try:
+                self._client.close()
+            except Exception:
+                pass
+            self._client = None
@@ -1,15 +1,27 @@
-from typing import Dict, Any, Optional, List, BinaryIO
+from typing import Dict, Any, Optional, List, BinaryIO, AsyncIterable, AsyncIterator, Awaitable, Callable
+from contextlib import aclosing
+import os
+import json
 import uuid
 import httpx
 import docker
+from docker.errors import NotFound
 import socket
+import ssl
 import logging
 import asyncio
 import io
+import tempfile
+import time
 from async_lru import alru_cache
 from app.domain.models.tool_result import ToolResult
 from app.domain.external.sandbox import Sandbox
-from app.infrastructure.external.browser.playwright_browser import PlaywrightBrowser
+from app.infrastructure.external.browser.browser_cache import get_browser_cache
+from app.infrastructure.external.sandbox.sandbox_pool import SandboxPool
+from app.infrastructure.external.sandbox.docker_control import DockerControlPlane
+from app.infrastructure.external.sandbox.fake_docker import FakeDockerClient
+from app.infrastructure.external.sandbox.sandbox_api_stub import SandboxApiStubServer
+from app.infrastructure.metrics import SANDBOX_CREATE_SECONDS, SANDBOX_DESTROY_SECONDS
 from app.domain.external.browser import Browser
 
 logger = logging.getLogger(__name__)
@@ -25,44 +37,144 @@ class Settings:
     sandbox_no_proxy = ""
     sandbox_network = "bridge"
     sandbox_address = None
+    # Label put on every sandbox container; the events stream is filtered on it
+    sandbox_label = "sheikhbox.sandbox"
+    # "docker" talks to the daemon, "fake" uses the in-memory FakeDockerClient
+    sandbox_docker_backend = os.environ.get("SANDBOX_DOCKER_BACKEND", "docker")
+    sandbox_docker_max_workers = 8
+    # Seconds FakeDockerClient sleeps per daemon call
+    sandbox_fake_docker_latency = float(os.environ.get("SANDBOX_FAKE_DOCKER_LATENCY", "0"))
+    # "http" talks to the API in the container, "stub" serves it on a loopback
+    # port of this process from a directory per sandbox under sandbox_api_stub_root.
+    # The stub runs commands on this host, so it requires the fake Docker backend
+    sandbox_api_backend = os.environ.get("SANDBOX_API_BACKEND", "http")
+    sandbox_api_stub_root = os.environ.get(
+        "SANDBOX_API_STUB_ROOT", os.path.join(tempfile.gettempdir(), "sheikhbox-sandboxes"))
+    # Warm pool of pre-started sandboxes; 0 disables the pool
+    sandbox_pool_size = int(os.environ.get("SANDBOX_POOL_SIZE", "0"))
+    sandbox_pool_refill_concurrency = int(os.environ.get("SANDBOX_POOL_REFILL_CONCURRENCY", "2"))
+    sandbox_pool_min_remaining_minutes = int(os.environ.get("SANDBOX_POOL_MIN_REMAINING_MINUTES", "30"))
+    sandbox_ready_timeout_seconds = 120
+    # Connection pool of the HTTP channel to each sandbox's API
+    sandbox_http_max_connections = 16
+    sandbox_http_max_keepalive_connections = 8
+    sandbox_http_keepalive_expiry_seconds = 120
+    sandbox_http_connect_timeout_seconds = 10
+    sandbox_http_timeout_seconds = 600
+    # Output of a command and content of a file returned to the LLM are cut to these sizes
+    sandbox_max_output_chars = 20000
+    sandbox_max_read_bytes = 1024 * 1024
 
 def get_settings():
     return Settings()
 
+_docker_control: Optional[DockerControlPlane] = None
+
+def get_docker_control() -> DockerControlPlane:
+    """Returns the process-wide Docker control plane."""
+    global _docker_control
+    if _docker_control is None:
+        settings = get_settings()
+        _docker_control = DockerControlPlane(
+            client_factory=(
+                (lambda: FakeDockerClient(latency=settings.sandbox_fake_docker_latency))
+                if settings.sandbox_docker_backend == "fake" else docker.from_env
+            ),
+            label=settings.sandbox_label,
+            max_workers=settings.sandbox_docker_max_workers,
+        )
+    return _docker_control
+
+_ssl_context: Optional[ssl.SSLContext] = None
+
+def _get_ssl_context() -> ssl.SSLContext:
+    """
+    One SSL context for every sandbox client; building one per client
+    loads the CA store each time and dominates sandbox creation.
+    """
+    global _ssl_context
+    if _ssl_context is None:
+        _ssl_context = ssl.create_default_context()
+    return _ssl_context
+
+_sandbox_api_stub: Optional[SandboxApiStubServer] = None
+
+def get_sandbox_api_stub() -> SandboxApiStubServer:
+    """Returns the process-wide stand-in for the sandbox API, used in stub mode."""
+    global _sandbox_api_stub
+    if _sandbox_api_stub is None:
+        settings = get_settings()
+        if settings.sandbox_docker_backend != "fake":
+            # Real sandboxes would have the LLM's commands run on the API host instead
+            raise RuntimeError("SANDBOX_API_BACKEND=stub requires SANDBOX_DOCKER_BACKEND=fake")
+        _sandbox_api_stub = SandboxApiStubServer(settings.sandbox_api_stub_root)
+    return _sandbox_api_stub
+
+async def _remove_stub_sandboxes(ids: List[str]):
+    if _sandbox_api_stub is not None:
+        await asyncio.gather(*(_sandbox_api_stub.remove(id) for id in ids))
+
+async def close_sandbox_api_stub():
+    global _sandbox_api_stub
+    if _sandbox_api_stub is not None:
+        await _sandbox_api_stub.close()
+        _sandbox_api_stub = None
+
+_sandbox_pool: Optional[SandboxPool] = None
+
+def get_sandbox_pool() -> Optional[SandboxPool]:
+    """Returns the process-wide sandbox pool, or None if pooling is disabled."""
+    global _sandbox_pool
+    settings = get_settings()
+    if _sandbox_pool is None and settings.sandbox_pool_size > 0:
+        _sandbox_pool = SandboxPool(
+            factory=DockerSandbox._create,
+            size=settings.sandbox_pool_size,
+            ttl_seconds=int(settings.sandbox_ttl_minutes) * 60,
+            min_remaining_seconds=settings.sandbox_pool_min_remaining_minutes * 60,
+            refill_concurrency=settings.sandbox_pool_refill_concurrency,
+            ready_timeout=settings.sandbox_ready_timeout_seconds,
+            # Served from the events-fed cache, so acquiring costs no round-trip
+            probe=DockerSandbox.is_running,
+        )
+    return _sandbox_pool
+
 class DockerSandbox(Sandbox):
-    def __init__(self, ip: str = None, container_name: str = None):
-        self.client = httpx.AsyncClient(timeout=600)
+    def __init__(self, ip: str = None, container_name: str = None, transport: Optional[httpx.AsyncBaseTransport] = None):
+        settings = get_settings()
         self.ip = ip
         self.base_url = f"http://{self.ip}:8080"
-        self._vnc_url = f"ws://{self.ip}:5901"
         self._cdp_url = f"http://{self.ip}:9222"
+        if transport is None and settings.sandbox_api_backend == "stub":
+            self.base_url = self._cdp_url = get_sandbox_api_stub().url_for(container_name or "dev-sandbox")
+        # One keep-alive pool per sandbox; `transport` lets tests mount the API in-process
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            transport=transport,
+            verify=_get_ssl_context(),
+            timeout=httpx.Timeout(settings.sandbox_http_timeout_seconds, connect=settings.sandbox_http_connect_timeout_seconds),
+            limits=httpx.Limits(
+                max_connections=settings.sandbox_http_max_connections,
+                max_keepalive_connections=settings.sandbox_http_max_keepalive_connections,
+                keepalive_expiry=settings.sandbox_http_keepalive_expiry_seconds,
+            ),
+        )
+        self._vnc_url = f"ws://{self.ip}:5901"
         self._container_name = container_name
     
     @property
     def id(self) -> str:
         return self._container_name or "dev-sandbox"
 
-    @staticmethod
-    def _get_container_ip(container) -> str:
-        network_settings = container.attrs['NetworkSettings']
-        ip_address = network_settings['IPAddress']
-        if not ip_address and 'Networks' in network_settings:
-            networks = network_settings['Networks']
-            for network_config in networks.values():
-                if 'IPAddress' in network_config and network_config['IPAddress']:
-                    ip_address = network_config['IPAddress']
-                    break
-        return ip_address
-
-    @staticmethod
-    def _create_task() -> 'DockerSandbox':
+    @classmethod
+    async def _create(cls) -> 'DockerSandbox':
         settings = get_settings()
         container_name = f"{settings.sandbox_name_prefix}-{str(uuid.uuid4())[:8]}"
         try:
-            docker_client = docker.from_env()
             container_config = {
                 "image": settings.sandbox_image, "name": container_name,
                 "detach": True, "remove": True,
+                "labels": {settings.sandbox_label: "true"},
                 "environment": {
                     "VNC_PW": "password",
                     "SERVICE_TIMEOUT_MINUTES": settings.sandbox_ttl_minutes,
@@ -72,46 +184,186 @@ class DockerSandbox(Sandbox):
             if settings.sandbox_network:
                 container_config["network"] = settings.sandbox_network
             
-            container = docker_client.containers.run(**container_config)
-            container.reload()
-            ip_address = DockerSandbox._get_container_ip(container)
-            return DockerSandbox(ip=ip_address, container_name=container_name)
+            info = await get_docker_control().run_container(container_config)
+            return cls(ip=info.ip, container_name=container_name)
         except Exception as e:
             raise Exception(f"Failed to create Docker sandbox: {e}")
 
+    async def close(self):
+        await get_browser_cache().release(self.id)
+        if self.client:
+            await self.client.aclose()
+
     async def destroy(self) -> bool:
         try:
-            if self.client:
-                await self.client.aclose()
-            if self._container_name:
-                docker_client = docker.from_env()
-                docker_client.containers.get(self._container_name).remove(force=True)
-            return True
+            with SANDBOX_DESTROY_SECONDS.time(method="single"):
+                await self.close()
+                if self._container_name:
+                    removed = await get_docker_control().remove(self._container_name)
+                    if removed:
+                        await _remove_stub_sandboxes([self._container_name])
+                    return removed
+                return True
         except Exception as e:
             logger.error(f"Failed to destroy Docker sandbox: {e}")
             return False
+
+    @classmethod
+    async def destroy_many(cls, ids: List[str]) -> Dict[str, bool]:
+        """Removes many sandbox containers in one go."""
+        with SANDBOX_DESTROY_SECONDS.time(method="batch"):
+            cache = get_browser_cache()
+            await asyncio.gather(*(cache.release(id) for id in ids))
+            results = await get_docker_control().remove_many(ids)
+            await _remove_stub_sandboxes([id for id, removed in results.items() if removed])
+            return results
     
+    async def is_ready(self) -> bool:
+        try:
+            cdp = await self.client.get(f"{self._cdp_url}/json/version", timeout=5)
+            if cdp.status_code != 200:
+                return False
+            api = await self.client.get("/", timeout=5)
+            return api.status_code < 500
+        except httpx.HTTPError:
+            return False
+
+    async def is_running(self) -> bool:
+        """Whether the sandbox's container is still running, per the Docker control plane."""
+        try:
+            return (await get_docker_control().inspect(self.id)).running
+        except NotFound:
+            return False
+
     async def get_browser(self) -> Browser:
-        return PlaywrightBrowser(self._cdp_url)
+        return get_browser_cache().get(self.id, self._cdp_url)
 
     @classmethod
     async def create(cls) -> Sandbox:
-        return await asyncio.to_thread(cls._create_task)
+        started = time.perf_counter()
+        pool = get_sandbox_pool()
+        if pool:
+            sandbox = await pool.acquire()
+            if sandbox:
+                SANDBOX_CREATE_SECONDS.observe(time.perf_counter() - started, source="pool")
+                return sandbox
+        sandbox = await cls._create()
+        SANDBOX_CREATE_SECONDS.observe(time.perf_counter() - started, source="cold")
+        return sandbox
     
     @classmethod
     async def get(cls, id: str) -> Sandbox:
-        docker_client = docker.from_env()
-        container = docker_client.containers.get(id)
-        container.reload()
-        ip_address = cls._get_container_ip(container)
-        return DockerSandbox(ip=ip_address, container_name=id)
+        info = await get_docker_control().inspect(id)
+        return DockerSandbox(ip=info.ip, container_name=id)
+
+    # --- Shell and file I/O over the sandbox API ---
+
+    async def exec_command(
+        self, session_id: str, exec_dir: str, command: str,
+        on_output: Optional[Callable[[str, str], Awaitable[None]]] = None,
+    ) -> ToolResult:
+        max_chars = get_settings().sandbox_max_output_chars
+        output = ""
+        exit_code = None
+        exec_id = uuid.uuid4().hex
+        try:
+            async with self.client.stream(
+                "POST", "/api/v1/shell/exec",
+                json={"session_id": session_id, "exec_id": exec_id, "exec_dir": exec_dir, "command": command},
+            ) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    event = json.loads(line)
+                    if event["type"] == "exit":
+                        exit_code = event["exit_code"]
+                        continue
+                    if on_output:
+                        await on_output(event["type"], event["data"])
+                    # Keep the tail, where errors usually are
+                    output = (output + event["data"])[-max_chars:]
+        except httpx.HTTPError as e:
+            return ToolResult(success=False, message=f"Failed to execute command: {e}")
+        except asyncio.CancelledError:
+            # Dropping the stream does not end the command; on stop or timeout kill it
+            await asyncio.shield(self.kill_command(session_id, exec_id))
+            raise
+        return ToolResult(success=exit_code == 0, data={"exit_code": exit_code, "output": output})
 
-    # --- Placeholder methods for other sandbox interactions ---
-    async def exec_command(self, session_id: str, exec_dir: str, command: str) -> ToolResult:
-        return ToolResult(success=False, message="Not implemented")
+    async def kill_command(self, session_id: str, exec_id: Optional[str] = None) -> bool:
+        try:
+            response = await self.client.post(
+                "/api/v1/shell/kill", json={"session_id": session_id, "exec_id": exec_id}, timeout=5)
+            response.raise_for_status()
+            return response.json()["killed"] > 0
+        except httpx.HTTPError as e:
+            logger.warning(f"Failed to kill command in sandbox {self.id}: {e}")
+            return False
+
+    async def file_write_stream(self, file: str, chunks: AsyncIterable[bytes]) -> ToolResult:
+        try:
+            response = await self.client.put("/api/v1/file", params={"path": file}, content=chunks)
+            response.raise_for_status()
+            return ToolResult(success=True, data=response.json())
+        except httpx.HTTPError as e:
+            return ToolResult(success=False, message=f"Failed to write {file}: {e}")
 
     async def file_write(self, file: str, content: str) -> ToolResult:
-        return ToolResult(success=False, message="Not implemented")
+        data = content.encode("utf-8")
+
+        async def chunks():
+            for start in range(0, len(data), 64 * 1024):
+                yield data[start:start + 64 * 1024]
+        return await self.file_write_stream(file, chunks())
+
+    async def file_read_stream(self, file: str) -> AsyncIterator[bytes]:
+        async with self.client.stream("GET", "/api/v1/file", params={"path": file}) as response:
+            if response.status_code == 404:
+                raise FileNotFoundError(file)
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes():
+                yield chunk
 
     async def file_read(self, file: str) -> ToolResult:
-        return ToolResult(success=False, message="Not implemented")
+        max_bytes = get_settings().sandbox_max_read_bytes
+        content = bytearray()
+        truncated = False
+        try:
+            async with aclosing(self.file_read_stream(file)) as chunks:
+                async for chunk in chunks:
+                    content += chunk
+                    if len(content) > max_bytes:
+                        # Closing the stream early aborts the rest of the transfer
+                        truncated = True
+                        break
+        except FileNotFoundError:
+            return ToolResult(success=False, message=f"File not found: {file}")
+        except httpx.HTTPError as e:
+            return ToolResult(success=False, message=f"Failed to read {file}: {e}")
+        return ToolResult(success=True, data={
+            "content": bytes(content[:max_bytes]).decode("utf-8", errors="replace"),
+            "truncated": truncated,
+        })
+
+    async def file_batch(self, operations: List[Dict[str, Any]]) -> ToolResult:
+        max_bytes = get_settings().sandbox_max_read_bytes
+        try:
+            response = await self.client.post(
+                "/api/v1/file/batch", json={"operations": operations, "max_read_bytes": max_bytes})
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            return ToolResult(success=False, message=f"Failed to run file batch: {e}")
+        results = response.json()["results"]
+        # Same cap as file_read, also when the sandbox ignores max_read_bytes
+        for result in results:
+            content = result.get("content")
+            if content is None:
+                continue
+            data = content.encode("utf-8")
+            if len(data) > max_bytes:
+                result["content"] = data[:max_bytes].decode("utf-8", errors="ignore")
+                result["truncated"] = True
+            else:
+                result.setdefault("truncated", False)
+        return ToolResult(success=True, data=results)
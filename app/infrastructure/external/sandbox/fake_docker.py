@@ -0,0 +1,188 @@
+from typing import Any, Dict, List, Optional
+import itertools
+import queue
+import threading
+import time
+import uuid
+from docker.errors import NotFound
+
+class FakeContainer:
+    """In-memory stand-in for docker.models.containers.Container."""
+
+    def __init__(self, client: "FakeDockerClient", name: str, config: Dict[str, Any], ip: str):
+        self._client = client
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.config = config
+        self.labels = dict(config.get("labels") or {})
+        self.status = "created"
+        self._ip = ip
+
+    @property
+    def attrs(self) -> Dict[str, Any]:
+        running = self.status == "running"
+        return {
+            "Id": self.id,
+            "Name": f"/{self.name}",
+            "State": {"Status": self.status, "Running": running},
+            "NetworkSettings": {
+                "IPAddress": "",
+                "Networks": {self.config.get("network") or "bridge": {"IPAddress": self._ip if running else ""}},
+            },
+        }
+
+    def reload(self):
+        self._client._delay()
+        if self.name not in self._client._containers:
+            raise NotFound(f"No such container: {self.name}")
+
+    def start(self):
+        self._client._delay()
+        self._client._set_status(self, "running", "start")
+
+    def stop(self, timeout: int = 10):
+        self._client._delay()
+        self._client._set_status(self, "exited", "die")
+
+    def remove(self, force: bool = False):
+        self._client._delay()
+        self._client._remove(self, force)
+
+class FakeContainerCollection:
+    def __init__(self, client: "FakeDockerClient"):
+        self._client = client
+
+    def run(self, image: str, name: Optional[str] = None, detach: bool = False, **config) -> FakeContainer:
+        self._client._delay()
+        container = self._client._add(name or f"fake-{uuid.uuid4().hex[:8]}", dict(config, image=image))
+        container.start()
+        return container
+
+    def get(self, container_id: str) -> FakeContainer:
+        self._client._delay()
+        container = self._client._find(container_id)
+        if container is None:
+            raise NotFound(f"No such container: {container_id}")
+        return container
+
+    def list(self, all: bool = False) -> List[FakeContainer]:
+        self._client._delay()
+        containers = list(self._client._containers.values())
+        return containers if all else [c for c in containers if c.status == "running"]
+
+class FakeEventStream:
+    """Blocking iterator over container events with the `close()` of docker's CancellableStream."""
+
+    _CLOSED = object()
+
+    def __init__(self, client: "FakeDockerClient", filters: Dict[str, Any]):
+        self._client = client
+        self._filters = filters
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+
+    def _publish(self, event: Dict[str, Any], labels: Dict[str, str]):
+        label = self._filters.get("label")
+        if label:
+            key, _, value = label.partition("=")
+            if key not in labels or (value and labels[key] != value):
+                return
+        self._queue.put(event)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> Dict[str, Any]:
+        event = self._queue.get()
+        if event is self._CLOSED:
+            raise StopIteration
+        return event
+
+    def close(self):
+        self._client._unsubscribe(self)
+        self._queue.put(self._CLOSED)
+
+class FakeDockerClient:
+    """
+    Daemon-free stand-in for the subset of docker.DockerClient used by
+    DockerControlPlane. `latency` seconds are slept on every call to
+    simulate a slow daemon.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+        self.containers = FakeContainerCollection(self)
+        self._containers: Dict[str, FakeContainer] = {}
+        self._streams: List[FakeEventStream] = []
+        self._ips = itertools.count(2)
+        self._lock = threading.Lock()
+
+    def _delay(self):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _add(self, name: str, config: Dict[str, Any]) -> FakeContainer:
+        with self._lock:
+            if name in self._containers:
+                raise ValueError(f"Conflict: container name {name} is already in use")
+            n = next(self._ips)
+            container = FakeContainer(self, name, config, f"172.30.{n // 250}.{n % 250 + 2}")
+            self._containers[name] = container
+        self._emit(container, "create")
+        return container
+
+    def _find(self, container_id: str) -> Optional[FakeContainer]:
+        container = self._containers.get(container_id)
+        if container is None:
+            container = next((c for c in self._containers.values() if c.id.startswith(container_id)), None)
+        return container
+
+    def _set_status(self, container: FakeContainer, status: str, action: str):
+        container.status = status
+        self._emit(container, action)
+        if status == "exited" and container.config.get("remove"):
+            self._remove(container, force=True)
+
+    def _remove(self, container: FakeContainer, force: bool):
+        with self._lock:
+            if self._containers.get(container.name) is not container:
+                raise NotFound(f"No such container: {container.name}")
+            if container.status == "running" and not force:
+                raise ValueError(f"Cannot remove running container {container.name}")
+            del self._containers[container.name]
+        if container.status == "running":
+            container.status = "exited"
+            self._emit(container, "die")
+        self._emit(container, "destroy")
+
+    def _emit(self, container: FakeContainer, action: str):
+        event = {
+            "Type": "container",
+            "Action": action,
+            "status": action,
+            "id": container.id,
+            "Actor": {"ID": container.id, "Attributes": dict(container.labels, name=container.name)},
+            "time": int(time.time()),
+        }
+        for stream in list(self._streams):
+            stream._publish(event, container.labels)
+
+    def _unsubscribe(self, stream: FakeEventStream):
+        with self._lock:
+            if stream in self._streams:
+                self._streams.remove(stream)
+
+    def events(self, decode: bool = False, filters: Optional[Dict[str, Any]] = None) -> FakeEventStream:
+        stream = FakeEventStream(self, filters or {})
+        with self._lock:
+            self._streams.append(stream)
+        return stream
+
+    def ping(self) -> bool:
+        self._delay()
+        return True
+
+    def close(self):
+        for stream in list(self._streams):
+            stream.close()
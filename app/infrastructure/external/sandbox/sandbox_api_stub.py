@@ -0,0 +1,272 @@
+"""
+Stand-in for the sandbox's port-8080 API, backed by a local directory and
+local subprocesses, to test and benchmark DockerSandbox without a container.
+SandboxApiStubServer serves it on a loopback port from the running event
+loop; it can also run on its own:
+
+    python -m app.infrastructure.external.sandbox.sandbox_api_stub --root /tmp/sandbox --port 8080
+
+httpx.ASGITransport buffers whole response bodies, so streaming only behaves
+like a real sandbox over an actual socket.
+"""
+from contextlib import contextmanager
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from pathlib import Path
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import signal
+import socket
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+# Size of the chunks file bodies are streamed in
+CHUNK_SIZE = 64 * 1024
+
+class ExecRequest(BaseModel):
+    session_id: str = ""
+    exec_id: str = ""
+    exec_dir: str = "/"
+    command: str
+
+class KillRequest(BaseModel):
+    session_id: str = ""
+    exec_id: Optional[str] = None
+
+class FileOperation(BaseModel):
+    op: str
+    path: str
+    content: Optional[str] = None
+
+class BatchRequest(BaseModel):
+    operations: List[FileOperation]
+    # Reads stop after this many bytes and report `truncated`
+    max_read_bytes: Optional[int] = None
+
+def _kill(process: asyncio.subprocess.Process):
+    """Kills a command together with the processes it started."""
+    if process.returncode is not None:
+        return
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+def create_sandbox_api(root: str) -> FastAPI:
+    """Creates the stand-in API; sandbox paths are resolved inside `root`."""
+    root_dir = Path(root).resolve()
+    root_dir.mkdir(parents=True, exist_ok=True)
+    api = FastAPI(title="Sandbox API stub")
+    # Running commands by (session_id, exec_id)
+    processes: Dict[Tuple[str, str], asyncio.subprocess.Process] = {}
+    api.state.processes = processes
+
+    def resolve(path: str) -> Path:
+        resolved = (root_dir / path.lstrip("/")).resolve()
+        if resolved != root_dir and root_dir not in resolved.parents:
+            raise HTTPException(status_code=400, detail=f"Path outside the sandbox: {path}")
+        return resolved
+
+    @api.get("/")
+    async def health():
+        return {"status": "ok"}
+
+    # Answers DockerSandbox.is_ready's CDP probe in stub mode
+    @api.get("/json/version")
+    async def cdp_version():
+        return {"Browser": "SandboxApiStub/1.0"}
+
+    @api.post("/api/v1/shell/exec")
+    async def exec_command(request: ExecRequest, http_request: Request):
+        cwd = resolve(request.exec_dir)
+        cwd.mkdir(parents=True, exist_ok=True)
+        process = await asyncio.create_subprocess_shell(
+            request.command, cwd=str(cwd),
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+            start_new_session=True,
+        )
+        key = (request.session_id, request.exec_id or str(process.pid))
+        processes[key] = process
+
+        async def wait_for_disconnect():
+            while (await http_request.receive())["type"] != "http.disconnect":
+                pass
+
+        async def events() -> AsyncIterator[bytes]:
+            queue: asyncio.Queue = asyncio.Queue()
+            # A command without output would otherwise only notice a gone client on its next send
+            watcher = asyncio.create_task(wait_for_disconnect())
+            watcher.add_done_callback(lambda task: None if task.cancelled() else _kill(process))
+
+            async def pump(stream: asyncio.StreamReader, name: str):
+                while True:
+                    data = await stream.read(4096)
+                    if not data:
+                        break
+                    await queue.put({"type": name, "data": data.decode("utf-8", errors="replace")})
+                await queue.put(None)
+
+            pumps = [
+                asyncio.create_task(pump(process.stdout, "stdout")),
+                asyncio.create_task(pump(process.stderr, "stderr")),
+            ]
+            try:
+                open_streams = len(pumps)
+                while open_streams:
+                    event = await queue.get()
+                    if event is None:
+                        open_streams -= 1
+                        continue
+                    yield (json.dumps(event) + "\n").encode()
+                exit_code = await process.wait()
+                yield (json.dumps({"type": "exit", "exit_code": exit_code}) + "\n").encode()
+            finally:
+                watcher.cancel()
+                for task in pumps:
+                    task.cancel()
+                if process.returncode is None:
+                    _kill(process)
+                    await process.wait()
+                processes.pop(key, None)
+
+        return StreamingResponse(events(), media_type="application/x-ndjson")
+
+    @api.post("/api/v1/shell/kill")
+    async def kill_command(request: KillRequest):
+        killed = [
+            process for (session_id, exec_id), process in list(processes.items())
+            if session_id == request.session_id and request.exec_id in (None, exec_id)
+            and process.returncode is None
+        ]
+        for process in killed:
+            _kill(process)
+        return {"killed": len(killed)}
+
+    @api.get("/api/v1/file")
+    async def read_file(path: str):
+        file = resolve(path)
+        if not file.is_file():
+            raise HTTPException(status_code=404, detail=f"No such file: {path}")
+
+        async def chunks() -> AsyncIterator[bytes]:
+            handle = await asyncio.to_thread(open, file, "rb")
+            try:
+                while True:
+                    chunk = await asyncio.to_thread(handle.read, CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    yield chunk
+            finally:
+                handle.close()
+
+        return StreamingResponse(chunks(), media_type="application/octet-stream")
+
+    @api.put("/api/v1/file")
+    async def write_file(path: str, request: Request):
+        file = resolve(path)
+        file.parent.mkdir(parents=True, exist_ok=True)
+        size = 0
+        handle = await asyncio.to_thread(open, file, "wb")
+        try:
+            async for chunk in request.stream():
+                if chunk:
+                    size += len(chunk)
+                    await asyncio.to_thread(handle.write, chunk)
+        finally:
+            handle.close()
+        return {"path": path, "size": size}
+
+    @api.post("/api/v1/file/batch")
+    async def batch(request: BatchRequest):
+        def run(operation: FileOperation):
+            try:
+                file = resolve(operation.path)
+                if operation.op == "read":
+                    with open(file, "rb") as handle:
+                        data = handle.read(-1 if request.max_read_bytes is None else request.max_read_bytes + 1)
+                    truncated = request.max_read_bytes is not None and len(data) > request.max_read_bytes
+                    return {
+                        "path": operation.path, "success": True, "truncated": truncated,
+                        "content": data[:request.max_read_bytes].decode("utf-8", errors="replace"),
+                    }
+                if operation.op == "write":
+                    file.parent.mkdir(parents=True, exist_ok=True)
+                    file.write_text(operation.content or "")
+                    return {"path": operation.path, "success": True}
+                return {"path": operation.path, "success": False, "message": f"Unknown operation {operation.op}"}
+            except HTTPException as e:
+                return {"path": operation.path, "success": False, "message": e.detail}
+            except OSError as e:
+                return {"path": operation.path, "success": False, "message": str(e)}
+
+        results = await asyncio.to_thread(lambda: [run(operation) for operation in request.operations])
+        return {"results": results}
+
+    return api
+
+class _EmbeddedServer(uvicorn.Server):
+    """A uvicorn server that leaves signal handling to the host process."""
+
+    @contextmanager
+    def capture_signals(self):
+        yield
+
+    def install_signal_handlers(self):
+        pass
+
+class SandboxApiStubServer:
+    """
+    Serves the stand-in API on a loopback port from the running event loop.
+    One server stands in for every sandbox of the process: the first path
+    segment names the sandbox, whose files live in that directory under `root`.
+    """
+
+    def __init__(self, root: str, host: str = "127.0.0.1"):
+        self._root = root
+        self._apis: Dict[str, FastAPI] = {}
+        # Bound and listening up front, so requests made before the server
+        # task runs wait in the backlog instead of being refused
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.bind((host, 0))
+        self._socket.listen(128)
+        self.url = f"http://{host}:{self._socket.getsockname()[1]}"
+        self._server = _EmbeddedServer(uvicorn.Config(
+            self._dispatch, interface="asgi3", lifespan="off", log_level="warning", access_log=False))
+        self._task = asyncio.get_running_loop().create_task(self._server.serve(sockets=[self._socket]))
+
+    def url_for(self, sandbox: str) -> str:
+        return f"{self.url}/{sandbox}"
+
+    async def _dispatch(self, scope, receive, send):
+        sandbox, _, rest = scope["path"].lstrip("/").partition("/")
+        if sandbox not in self._apis:
+            self._apis[sandbox] = create_sandbox_api(os.path.join(self._root, sandbox))
+        path = "/" + rest
+        await self._apis[sandbox](dict(scope, path=path, raw_path=path.encode()), receive, send)
+
+    async def remove(self, sandbox: str):
+        """Kills the running commands of a destroyed sandbox and deletes its directory."""
+        api = self._apis.pop(sandbox, None)
+        if api is not None:
+            for process in list(api.state.processes.values()):
+                _kill(process)
+        path = os.path.join(self._root, sandbox)
+        if os.path.dirname(os.path.normpath(path)) == os.path.normpath(self._root):
+            await asyncio.to_thread(shutil.rmtree, path, True)
+
+    async def close(self):
+        self._server.should_exit = True
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._socket.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the sandbox API stand-in")
+    parser.add_argument("--root", default="/tmp/sheikhbox-sandbox")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+    uvicorn.run(create_sandbox_api(args.root), host=args.host, port=args.port)
@@ -0,0 +1,193 @@
+from typing import Awaitable, Callable, Deque, Dict, Any, Optional, Set
+from collections import deque
+import asyncio
+import logging
+import time
+from app.domain.external.sandbox import Sandbox
+
+logger = logging.getLogger(__name__)
+
+class _PooledSandbox:
+    """A booted, health-checked sandbox waiting in the pool."""
+
+    def __init__(self, sandbox: Sandbox, booted_at: float):
+        self.sandbox = sandbox
+        self.booted_at = booted_at
+
+class SandboxPool:
+    """
+    Keeps a number of sandboxes booted and ready so sessions can be created
+    without waiting for a container to start.
+
+    Sandboxes are created through `factory`, which must return a sandbox
+    exposing an async `is_ready()` probe. Pooled sandboxes are retired once
+    less than `min_remaining_seconds` of their TTL is left, so a session
+    always gets a reasonably fresh container, and are checked with `probe`
+    (`is_ready()` by default) on acquire so a container that died while
+    idle is never handed out.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], Awaitable[Sandbox]],
+        size: int,
+        ttl_seconds: float,
+        min_remaining_seconds: float,
+        refill_concurrency: int = 2,
+        ready_timeout: float = 120,
+        check_interval: float = 5,
+        probe: Optional[Callable[[Sandbox], Awaitable[bool]]] = None,
+    ):
+        self._factory = factory
+        self.size = size
+        self._ttl_seconds = ttl_seconds
+        self._min_remaining_seconds = min_remaining_seconds
+        self._refill_concurrency = max(1, refill_concurrency)
+        self._ready_timeout = ready_timeout
+        self._check_interval = check_interval
+        self._probe = probe or (lambda sandbox: sandbox.is_ready())
+
+        self._idle: Deque[_PooledSandbox] = deque()
+        self._refills: Set[asyncio.Task] = set()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+        self._hits = 0
+        self._misses = 0
+        self._refilled = 0
+        self._refill_failures = 0
+        self._retired = 0
+        self._dead = 0
+        self._refill_latencies: Deque[float] = deque(maxlen=100)
+
+    async def start(self):
+        """Start the background task that keeps the pool filled."""
+        if self._task is None and self.size > 0:
+            self._task = asyncio.create_task(self._maintain())
+
+    async def stop(self):
+        """Stop refilling and destroy every sandbox still in the pool."""
+        tasks = list(self._refills)
+        if self._task:
+            tasks.append(self._task)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+        self._refills.clear()
+        idle, self._idle = list(self._idle), deque()
+        await asyncio.gather(*(entry.sandbox.destroy() for entry in idle), return_exceptions=True)
+
+    async def acquire(self) -> Optional[Sandbox]:
+        """
+        Takes a ready sandbox out of the pool.
+        Returns None on a miss; the caller should then create one itself.
+        """
+        while self._idle:
+            entry = self._idle.popleft()
+            if self._is_expiring(entry):
+                await self._retire(entry)
+                continue
+            if not await self._is_alive(entry):
+                await self._discard(entry)
+                continue
+            self._hits += 1
+            self._wakeup.set()
+            return entry.sandbox
+        self._misses += 1
+        self._wakeup.set()
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        latencies = list(self._refill_latencies)
+        return {
+            "size": self.size,
+            "idle": len(self._idle),
+            "refilling": len(self._refills),
+            "hits": self._hits,
+            "misses": self._misses,
+            "refilled": self._refilled,
+            "refill_failures": self._refill_failures,
+            "retired": self._retired,
+            "dead": self._dead,
+            "refill_latency_last": latencies[-1] if latencies else None,
+            "refill_latency_avg": sum(latencies) / len(latencies) if latencies else None,
+            "refill_latency_max": max(latencies) if latencies else None,
+        }
+
+    def _is_expiring(self, entry: _PooledSandbox) -> bool:
+        age = time.monotonic() - entry.booted_at
+        return self._ttl_seconds - age < self._min_remaining_seconds
+
+    async def _retire(self, entry: _PooledSandbox):
+        self._retired += 1
+        logger.info(f"Retiring pooled sandbox {entry.sandbox.id} before its TTL runs out")
+        await entry.sandbox.destroy()
+
+    async def _is_alive(self, entry: _PooledSandbox) -> bool:
+        try:
+            return await self._probe(entry.sandbox)
+        except Exception as e:
+            logger.warning(f"Liveness probe of pooled sandbox {entry.sandbox.id} failed: {e}")
+            return False
+
+    async def _discard(self, entry: _PooledSandbox):
+        self._dead += 1
+        logger.warning(f"Dropping pooled sandbox {entry.sandbox.id}: it is no longer ready")
+        try:
+            await entry.sandbox.destroy()
+        except Exception as e:
+            logger.warning(f"Failed to destroy dead pooled sandbox {entry.sandbox.id}: {e}")
+
+    async def _maintain(self):
+        while True:
+            try:
+                expiring = [entry for entry in self._idle if self._is_expiring(entry)]
+                for entry in expiring:
+                    self._idle.remove(entry)
+                await asyncio.gather(*(self._retire(entry) for entry in expiring), return_exceptions=True)
+
+                missing = self.size - len(self._idle) - len(self._refills)
+                for _ in range(min(missing, self._refill_concurrency - len(self._refills))):
+                    task = asyncio.create_task(self._refill_one())
+                    self._refills.add(task)
+                    task.add_done_callback(self._refills.discard)
+                    task.add_done_callback(lambda _: self._wakeup.set())
+            except Exception as e:
+                logger.error(f"Sandbox pool maintenance failed: {e}")
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._check_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _refill_one(self):
+        started = time.monotonic()
+        sandbox = None
+        try:
+            sandbox = await self._factory()
+            if not await self._wait_ready(sandbox):
+                raise TimeoutError(f"sandbox {sandbox.id} not ready after {self._ready_timeout}s")
+        except asyncio.CancelledError:
+            if sandbox:
+                await sandbox.destroy()
+            raise
+        except Exception as e:
+            self._refill_failures += 1
+            logger.warning(f"Failed to refill sandbox pool: {e}")
+            if sandbox:
+                await sandbox.destroy()
+            return
+
+        self._refilled += 1
+        self._refill_latencies.append(time.monotonic() - started)
+        self._idle.append(_PooledSandbox(sandbox, started))
+
+    async def _wait_ready(self, sandbox: Sandbox) -> bool:
+        deadline = time.monotonic() + self._ready_timeout
+        while time.monotonic() < deadline:
+            if await sandbox.is_ready():
+                return True
+            await asyncio.sleep(1)
+        return False
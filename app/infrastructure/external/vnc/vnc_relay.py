@@ -0,0 +1,653 @@
+from typing import Any, Awaitable, Callable, Deque, Dict, Generator, List, NamedTuple, Optional, Set, Tuple
+from collections import deque
+import asyncio
+import logging
+import os
+import struct
+import time
+from fastapi import WebSocket, WebSocketDisconnect
+import websockets
+from app.infrastructure.metrics import ACTIVE_VNC_CONNECTIONS
+
+logger = logging.getLogger(__name__)
+
+# RFB client-to-server message types
+_SET_PIXEL_FORMAT = 0
+_SET_ENCODINGS = 2
+_FRAMEBUFFER_UPDATE_REQUEST = 3
+_KEY_EVENT = 4
+_POINTER_EVENT = 5
+_CLIENT_CUT_TEXT = 6
+_INPUT_MESSAGES = {_KEY_EVENT, _POINTER_EVENT, _CLIENT_CUT_TEXT}
+_VNC_AUTH = 2
+
+# RFB server-to-client message types
+_FRAMEBUFFER_UPDATE = 0
+_SET_COLOUR_MAP_ENTRIES = 1
+_BELL = 2
+_SERVER_CUT_TEXT = 3
+
+# Rectangle encodings the relay can frame
+_RAW = 0
+_COPY_RECT = 1
+_RRE = 2
+_HEXTILE = 5
+_DESKTOP_SIZE = -223
+_LAST_RECT = -224
+_CURSOR = -239
+_DESKTOP_NAME = -307
+_EXTENDED_DESKTOP_SIZE = -308
+# ZRLE and Tight keep zlib state across updates, so a viewer that joins late
+# or skips an update could not decode the next one; they are not offered
+# while the upstream is shared (see VncRelay).
+_SUPPORTED_ENCODINGS = {
+    _RAW, _COPY_RECT, _RRE, _HEXTILE, _DESKTOP_SIZE, _LAST_RECT, _CURSOR, _DESKTOP_NAME, _EXTENDED_DESKTOP_SIZE,
+}
+
+# Close code sent to viewers when the upstream goes away; clients reconnect later
+_CLOSE_TRY_AGAIN_LATER = 1013
+
+class _ClientStream:
+    """
+    Splits the bytes a viewer sends into RFB messages: first the 3.7/3.8
+    handshake replies (version, security type, VNC auth response, ClientInit),
+    then normal client-to-server messages.
+    """
+
+    def __init__(self):
+        self._buffer = b""
+        self._state = "version"
+        self.handshake_done = False
+
+    def _next_size(self) -> Optional[int]:
+        if self._state == "version":
+            return 12
+        if self._state == "auth":
+            return 16
+        if self._state in ("security", "init"):
+            return 1
+        if not self._buffer:
+            return None
+        message_type = self._buffer[0]
+        if message_type == _SET_PIXEL_FORMAT:
+            return 20
+        if message_type == _SET_ENCODINGS:
+            return 4 + 4 * struct.unpack(">H", self._buffer[2:4])[0] if len(self._buffer) >= 4 else None
+        if message_type == _FRAMEBUFFER_UPDATE_REQUEST:
+            return 10
+        if message_type == _KEY_EVENT:
+            return 8
+        if message_type == _POINTER_EVENT:
+            return 6
+        if message_type == _CLIENT_CUT_TEXT:
+            return 8 + struct.unpack(">I", self._buffer[4:8])[0] if len(self._buffer) >= 8 else None
+        raise ValueError(f"Unknown RFB client message type {message_type}")
+
+    def feed(self, data: bytes) -> List[Tuple[Optional[int], bytes]]:
+        """
+        Returns the complete messages in `data` as (type, bytes) pairs;
+        handshake replies have type None.
+        """
+        self._buffer += data
+        messages = []
+        while True:
+            size = self._next_size()
+            if size is None or len(self._buffer) < size:
+                return messages
+            message, self._buffer = self._buffer[:size], self._buffer[size:]
+            if self._state == "version":
+                self._state = "security"
+            elif self._state == "security":
+                self._state = "auth" if message[0] == _VNC_AUTH else "init"
+            elif self._state == "auth":
+                self._state = "init"
+            elif self._state == "init":
+                self._state = "normal"
+                self.handshake_done = True
+            else:
+                messages.append((message[0], message))
+                continue
+            messages.append((None, message))
+
+def _filter_encodings(message: bytes) -> bytes:
+    """Rewrites a SetEncodings message to the encodings the relay can frame."""
+    count = struct.unpack(">H", message[2:4])[0]
+    encodings = [
+        encoding for encoding in struct.unpack(f">{count}i", message[4:4 + 4 * count])
+        if encoding in _SUPPORTED_ENCODINGS
+    ] or [_RAW]
+    return struct.pack(f">BBH{len(encodings)}i", _SET_ENCODINGS, 0, len(encodings), *encodings)
+
+class _Piece(NamedTuple):
+    """A run of upstream bytes belonging to one server message."""
+    data: bytes
+    seq: int
+    type: Optional[int]
+    first: bool
+    last: bool
+
+# Instructions of the _ServerStream parser
+_START, _TYPE, _READ, _SKIP, _END = range(5)
+
+class _ServerStream:
+    """
+    Splits the bytes the sandbox sends after the handshake into RFB messages.
+
+    Websockify forwards raw TCP chunks, so one websocket frame may hold the
+    tail of one message and the head of the next. `feed` cuts frames into
+    pieces that each belong to a single message, numbered in order, which
+    lets the relay start a viewer on a message boundary and drop whole
+    framebuffer updates. Rectangle payloads are skipped, not buffered.
+    """
+
+    def __init__(self, pixel_format: bytes):
+        self.pixel_format = pixel_format
+        self._seq = 0
+        self._type: Optional[int] = None
+        self._first = False
+        self._partial = bytearray()
+        self._parser = self._messages()
+        self._op = next(self._parser)
+
+    @property
+    def next_seq(self) -> int:
+        """Number the next message starting upstream will get."""
+        return self._seq + 1
+
+    def feed(self, data: bytes) -> List[_Piece]:
+        pieces = []
+        pos = start = 0
+        while True:
+            op, arg = self._op
+            if op == _START:
+                if pos == len(data):
+                    break
+                self._seq += 1
+                self._first = True
+                start = pos
+                self._op = self._parser.send(None)
+            elif op == _TYPE:
+                self._type = arg
+                self._op = self._parser.send(None)
+            elif op == _END:
+                pieces.append(_Piece(data[start:pos], self._seq, self._type, self._first, True))
+                self._type = None
+                self._op = self._parser.send(None)
+            elif op == _SKIP:
+                size = min(arg, len(data) - pos)
+                pos += size
+                if size < arg:
+                    self._op = (_SKIP, arg - size)
+                    break
+                self._op = self._parser.send(None)
+            else:
+                chunk = data[pos:pos + arg - len(self._partial)]
+                self._partial += chunk
+                pos += len(chunk)
+                if len(self._partial) < arg:
+                    break
+                value, self._partial = bytes(self._partial), bytearray()
+                self._op = self._parser.send(value)
+        if self._type is not None and pos > start:
+            pieces.append(_Piece(data[start:pos], self._seq, self._type, self._first, False))
+            self._first = False
+        return pieces
+
+    @property
+    def _bytes_per_pixel(self) -> int:
+        return self.pixel_format[0] // 8
+
+    def _messages(self) -> Generator:
+        while True:
+            yield (_START, None)
+            message_type = (yield (_READ, 1))[0]
+            yield (_TYPE, message_type)
+            if message_type == _FRAMEBUFFER_UPDATE:
+                yield from self._framebuffer_update()
+            elif message_type == _SET_COLOUR_MAP_ENTRIES:
+                header = yield (_READ, 5)
+                yield (_SKIP, 6 * struct.unpack(">H", header[3:5])[0])
+            elif message_type == _SERVER_CUT_TEXT:
+                header = yield (_READ, 7)
+                yield (_SKIP, struct.unpack(">I", header[3:7])[0])
+            elif message_type != _BELL:
+                raise ValueError(f"Unknown RFB server message type {message_type}")
+            yield (_END, None)
+
+    def _framebuffer_update(self) -> Generator:
+        header = yield (_READ, 3)
+        rectangles = struct.unpack(">H", header[1:3])[0]
+        # 0xFFFF rectangles means "until a LastRect pseudo-rectangle"
+        index = 0
+        while rectangles == 0xFFFF or index < rectangles:
+            index += 1
+            _, _, width, height, encoding = struct.unpack(">HHHHi", (yield (_READ, 12)))
+            if encoding == _LAST_RECT:
+                break
+            yield from self._rectangle(width, height, encoding)
+
+    def _rectangle(self, width: int, height: int, encoding: int) -> Generator:
+        bpp = self._bytes_per_pixel
+        if encoding == _RAW:
+            yield (_SKIP, width * height * bpp)
+        elif encoding == _COPY_RECT:
+            yield (_SKIP, 4)
+        elif encoding == _RRE:
+            subrects = struct.unpack(">I", (yield (_READ, 4)))[0]
+            yield (_SKIP, bpp + subrects * (bpp + 8))
+        elif encoding == _HEXTILE:
+            for y in range(0, height, 16):
+                for x in range(0, width, 16):
+                    tile_width, tile_height = min(16, width - x), min(16, height - y)
+                    subencoding = (yield (_READ, 1))[0]
+                    if subencoding & 1:
+                        yield (_SKIP, tile_width * tile_height * bpp)
+                        continue
+                    # Background and foreground colours
+                    yield (_SKIP, bpp * (bool(subencoding & 2) + bool(subencoding & 4)))
+                    if subencoding & 8:
+                        subrects = (yield (_READ, 1))[0]
+                        yield (_SKIP, subrects * (2 + (bpp if subencoding & 16 else 0)))
+        elif encoding == _CURSOR:
+            yield (_SKIP, width * height * bpp + (width + 7) // 8 * height)
+        elif encoding == _DESKTOP_NAME:
+            yield (_SKIP, struct.unpack(">I", (yield (_READ, 4)))[0])
+        elif encoding == _EXTENDED_DESKTOP_SIZE:
+            screens = (yield (_READ, 4))[0]
+            yield (_SKIP, 16 * screens)
+        elif encoding != _DESKTOP_SIZE:
+            raise ValueError(f"Unsupported RFB encoding {encoding}")
+
+def _parse_server_init(handshake: bytes) -> Optional[Tuple[int, int, bytes]]:
+    """
+    Reads the framebuffer size and pixel format from the ServerInit message
+    that ends the server handshake.
+    """
+    for name_length in range(0, max(0, len(handshake) - 23)):
+        start = len(handshake) - 24 - name_length
+        if start < 0:
+            break
+        if struct.unpack(">I", handshake[start + 20:start + 24])[0] == name_length:
+            width, height = struct.unpack(">HH", handshake[start:start + 4])
+            return width, height, handshake[start + 4:start + 20]
+    return None
+
+class VncViewer:
+    """One browser connected to a relay, with a bounded outgoing queue."""
+
+    def __init__(self, websocket: WebSocket, controller: bool, max_queue: int, max_queue_bytes: int,
+                 resync: Callable[[], Awaitable[None]]):
+        self.websocket = websocket
+        self.controller = controller
+        self.client = _ClientStream()
+        self._max_queue = max_queue
+        self._max_queue_bytes = max_queue_bytes
+        self._queue: Deque[_Piece] = deque()
+        self._queued_bytes = 0
+        self._ready = asyncio.Event()
+        self._room = asyncio.Event()
+        # First upstream message this viewer gets; None until it may get any
+        self.sync_seq: Optional[int] = None
+        # Message whose head was sent but not its tail; it must not be dropped
+        self._sending_seq: Optional[int] = None
+        # Latest dropped message, whose remaining pieces are dropped too
+        self._dropped_seq: Optional[int] = None
+        # Updates were dropped; ask for a full one once the queue has drained
+        self.needs_resync = False
+        self._resync = resync
+        self.closing = False
+        self.updates_dropped = 0
+        self.bytes_sent = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def _enqueue(self, piece: _Piece):
+        self._queue.append(piece)
+        self._queued_bytes += len(piece.data)
+        self._ready.set()
+
+    @property
+    def _full(self) -> bool:
+        return len(self._queue) > self._max_queue or self._queued_bytes > self._max_queue_bytes
+
+    def offer_raw(self, data: bytes):
+        """Queues bytes that bypass framing: the handshake, or everything on an unshared upstream."""
+        self._enqueue(_Piece(data, 0, None, True, True))
+
+    async def wait_for_room(self):
+        """Waits until the queue is within its limits again."""
+        while self._full and not self.closing:
+            self._room.clear()
+            await self._room.wait()
+
+    def close(self):
+        """Makes the sender close the websocket once it gets to run."""
+        self.closing = True
+        self._ready.set()
+        self._room.set()
+
+    def offer(self, piece: _Piece):
+        """
+        Queues a piece of an upstream message, starting at the first message
+        numbered `sync_seq`. When the queue is full, queued framebuffer
+        updates that have not started going out are dropped, and a full
+        update is requested once the viewer has caught up.
+        """
+        if self.sync_seq is None or piece.seq < self.sync_seq or piece.seq == self._dropped_seq:
+            return
+        self._enqueue(piece)
+        if self._full:
+            self._drop_updates()
+
+    def _drop_updates(self):
+        kept: Deque[_Piece] = deque()
+        dropped = 0
+        for piece in self._queue:
+            if piece.type == _FRAMEBUFFER_UPDATE and piece.seq != self._sending_seq:
+                dropped += piece.first
+                self._dropped_seq = piece.seq
+            else:
+                kept.append(piece)
+        self._queue = kept
+        self._queued_bytes = sum(len(piece.data) for piece in kept)
+        self.updates_dropped += dropped
+        self.needs_resync = self.needs_resync or dropped > 0
+
+    async def send_loop(self):
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+            while self._queue and not self.closing:
+                piece = self._queue.popleft()
+                self._queued_bytes -= len(piece.data)
+                self._sending_seq = None if piece.last else piece.seq
+                self._room.set()
+                await self.websocket.send_bytes(piece.data)
+                self.bytes_sent += len(piece.data)
+            if self.needs_resync and not self._queue and not self.closing:
+                self.needs_resync = False
+                await self._resync()
+            if self.closing:
+                await self.websocket.close(code=_CLOSE_TRY_AGAIN_LATER)
+                return
+
+class VncRelay:
+    """
+    Shares one upstream VNC connection of a sandbox between many viewers.
+
+    The first viewer (the driver) performs the RFB handshake with the
+    sandbox; the server side of it is recorded and replayed to viewers
+    joining later, whose own handshake replies are swallowed. Only the
+    controller's input events and the driver's pixel-format/encoding choices
+    reach the sandbox; framebuffer update requests are forwarded from
+    everyone. If the driver leaves before the handshake completes the relay
+    closes, and viewers reconnect to a fresh one.
+
+    After the handshake, upstream bytes are split into server messages. A
+    late viewer starts with the first message after its full update request;
+    a slow viewer skips whole framebuffer updates and asks for a full one.
+    This needs encodings without state across updates, so ZRLE and Tight are
+    removed from the driver's SetEncodings. Raw/Hextile updates are several
+    times larger, which costs bandwidth even for a single viewer; with
+    `share_upstream=False` the driver's encodings are kept, its updates pass
+    through unframed with backpressure instead of drops, and other viewers
+    are turned away.
+
+    Security: late viewers' VNC authentication responses are not checked
+    (the relay cannot verify them against the recorded challenge), so the
+    sandbox's VNC password only applies to the driver. The endpoint serving
+    the relay must be access-controlled by the application.
+    """
+
+    def __init__(
+        self,
+        session_id: str,
+        upstream_url: str,
+        connect: Callable = websockets.connect,
+        max_queue: int = 64,
+        max_queue_bytes: int = 16 * 1024 * 1024,
+        share_upstream: bool = True,
+        handshake_timeout: float = 30,
+    ):
+        self.session_id = session_id
+        self._upstream_url = upstream_url
+        self._connect = connect
+        self._max_queue = max_queue
+        self._max_queue_bytes = max_queue_bytes
+        self._share_upstream = share_upstream
+        self._handshake_timeout = handshake_timeout
+        self._upstream = None
+        self._reader: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self._driver: Optional[VncViewer] = None
+        self.viewers: Set[VncViewer] = set()
+        self.controller: Optional[VncViewer] = None
+        self._handshake: List[bytes] = []
+        self._handshake_done = asyncio.Event()
+        self._server: Optional[_ServerStream] = None
+        self._framebuffer_size: Optional[Tuple[int, int]] = None
+        self._started_at = time.monotonic()
+        self.bytes_from_upstream = 0
+        self.frames_from_upstream = 0
+        self.messages_from_upstream = 0
+        self.bytes_to_upstream = 0
+        self.resyncs = 0
+        self.max_queue_depth = 0
+        # Totals of viewers that have already left
+        self._departed_bytes_sent = 0
+        self._departed_updates_dropped = 0
+        self.closed = False
+
+    def stats(self) -> Dict[str, Any]:
+        uptime = time.monotonic() - self._started_at
+        depths = [viewer.queue_depth for viewer in self.viewers]
+        return {
+            "viewers": len(self.viewers),
+            "has_controller": self.controller is not None,
+            "bytes_from_upstream": self.bytes_from_upstream,
+            "frames_from_upstream": self.frames_from_upstream,
+            "messages_from_upstream": self.messages_from_upstream,
+            "bytes_to_upstream": self.bytes_to_upstream,
+            "upstream_bytes_per_second": self.bytes_from_upstream / uptime if uptime else 0,
+            "bytes_to_viewers": self._departed_bytes_sent + sum(viewer.bytes_sent for viewer in self.viewers),
+            "updates_dropped": self._departed_updates_dropped + sum(viewer.updates_dropped for viewer in self.viewers),
+            "resyncs": self.resyncs,
+            "queue_depths": depths,
+            "max_queue_depth": self.max_queue_depth,
+        }
+
+    async def _ensure_upstream(self):
+        async with self._lock:
+            if self._upstream is None:
+                self._upstream = await self._connect(self._upstream_url, subprotocols=["binary"])
+                self._reader = asyncio.create_task(self._read_upstream())
+
+    async def _read_upstream(self):
+        try:
+            async for frame in self._upstream:
+                if isinstance(frame, str):
+                    frame = frame.encode()
+                self.bytes_from_upstream += len(frame)
+                self.frames_from_upstream += 1
+                if not self._handshake_done.is_set():
+                    self._handshake.append(frame)
+                    if self._driver is not None:
+                        self._driver.offer_raw(frame)
+                    continue
+                if not self._share_upstream:
+                    self._driver.offer_raw(frame)
+                    self.max_queue_depth = max(self.max_queue_depth, self._driver.queue_depth)
+                    await self._driver.wait_for_room()
+                    continue
+                for piece in self._server.feed(frame):
+                    self.messages_from_upstream += piece.last
+                    for viewer in list(self.viewers):
+                        if viewer.closing:
+                            continue
+                        viewer.offer(piece)
+                        self.max_queue_depth = max(self.max_queue_depth, viewer.queue_depth)
+                # Let viewer senders run between frames already buffered upstream
+                await asyncio.sleep(0)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        except Exception as e:
+            logger.error(f"VNC upstream of session {self.session_id} failed: {e}")
+        finally:
+            self._close_viewers()
+
+    def _close_viewers(self):
+        self.closed = True
+        for viewer in list(self.viewers):
+            viewer.close()
+
+    async def _send_upstream(self, data: bytes):
+        self.bytes_to_upstream += len(data)
+        await self._upstream.send(data)
+
+    async def _replay_handshake(self, viewer: VncViewer):
+        try:
+            await asyncio.wait_for(self._handshake_done.wait(), self._handshake_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"VNC handshake of session {self.session_id} did not complete; closing a waiting viewer")
+            viewer.close()
+            return
+        for frame in self._handshake:
+            viewer.offer_raw(frame)
+
+    def _finish_handshake(self):
+        server_init = _parse_server_init(b"".join(self._handshake))
+        if server_init is None:
+            raise ValueError("Could not read the RFB ServerInit message")
+        width, height, pixel_format = server_init
+        self._framebuffer_size = (width, height)
+        self._server = _ServerStream(pixel_format)
+        self._handshake_done.set()
+
+    async def _resync(self):
+        logger.info(f"A VNC viewer of session {self.session_id} fell behind; requesting a full update")
+        self.resyncs += 1
+        await self._request_full_update()
+
+    async def _request_full_update(self):
+        if self._framebuffer_size:
+            await self._send_upstream(struct.pack(
+                ">BBHHHH", _FRAMEBUFFER_UPDATE_REQUEST, 0, 0, 0, *self._framebuffer_size))
+
+    async def _handle_client(self, viewer: VncViewer, data: bytes):
+        was_done = viewer.client.handshake_done
+        for message_type, message in viewer.client.feed(data):
+            if viewer is self._driver:
+                if message_type is not None and not self._handshake_done.is_set():
+                    self._finish_handshake()
+                if message_type == _SET_ENCODINGS and self._share_upstream:
+                    message = _filter_encodings(message)
+                elif message_type == _SET_PIXEL_FORMAT:
+                    self._server.pixel_format = message[4:20]
+                if message_type is None or message_type not in _INPUT_MESSAGES or viewer.controller:
+                    await self._send_upstream(message)
+            elif message_type == _FRAMEBUFFER_UPDATE_REQUEST:
+                await self._send_upstream(message)
+            elif message_type in _INPUT_MESSAGES and viewer.controller:
+                await self._send_upstream(message)
+        if viewer is not self._driver and viewer.client.handshake_done and not was_done:
+            # A late viewer starts at the first message after its full update request
+            viewer.sync_seq = self._server.next_seq
+            await self._request_full_update()
+
+    async def attach(self, websocket: WebSocket, want_control: bool):
+        """Serves one viewer until it disconnects."""
+        if not self._share_upstream and self._driver is not None:
+            logger.info(f"Turning away a second VNC viewer of session {self.session_id}: the upstream is not shared")
+            await websocket.close(code=_CLOSE_TRY_AGAIN_LATER)
+            return
+        viewer = VncViewer(websocket, False, self._max_queue, self._max_queue_bytes, self._resync)
+        if want_control and self.controller is None:
+            viewer.controller = True
+            self.controller = viewer
+        if self._driver is None:
+            self._driver = viewer
+            viewer.sync_seq = 0
+        self.viewers.add(viewer)
+
+        sender = replay = None
+        try:
+            await self._ensure_upstream()
+            sender = asyncio.create_task(viewer.send_loop())
+            if viewer is not self._driver:
+                replay = asyncio.create_task(self._replay_handshake(viewer))
+            while not self.closed and not sender.done():
+                receive = asyncio.ensure_future(websocket.receive())
+                done, _ = await asyncio.wait({receive, sender}, return_when=asyncio.FIRST_COMPLETED)
+                if receive not in done:
+                    receive.cancel()
+                    break
+                message = receive.result()
+                if message["type"] == "websocket.disconnect":
+                    break
+                data = message.get("bytes") or (message.get("text") or "").encode()
+                await self._handle_client(viewer, data)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            for task in (sender, replay):
+                if task:
+                    task.cancel()
+            viewer.close()
+            self.viewers.discard(viewer)
+            self._departed_bytes_sent += viewer.bytes_sent
+            self._departed_updates_dropped += viewer.updates_dropped
+            if self.controller is viewer:
+                self.controller = None
+            if viewer is self._driver and not self._handshake_done.is_set():
+                # Nobody else can complete the handshake on this upstream
+                logger.info(f"VNC driver of session {self.session_id} left during the handshake; closing the relay")
+                await self.close()
+
+    async def close(self):
+        self._close_viewers()
+        if self._upstream is not None:
+            await self._upstream.close()
+        if self._reader is not None:
+            await asyncio.gather(self._reader, return_exceptions=True)
+
+class VncRelayManager:
+    """Keeps one VncRelay per session while it has viewers."""
+
+    def __init__(self, connect: Callable = websockets.connect, max_queue: int = 64,
+                 max_queue_bytes: int = 16 * 1024 * 1024, share_upstream: bool = True):
+        self._connect = connect
+        self._max_queue = max_queue
+        self._max_queue_bytes = max_queue_bytes
+        self._share_upstream = share_upstream
+        self._relays: Dict[str, VncRelay] = {}
+
+    async def attach(self, session_id: str, upstream_url: str, websocket: WebSocket, want_control: bool = True):
+        relay = self._relays.get(session_id)
+        if relay is None or relay.closed:
+            relay = VncRelay(session_id, upstream_url, self._connect, self._max_queue, self._max_queue_bytes,
+                             share_upstream=self._share_upstream)
+            self._relays[session_id] = relay
+        try:
+            await relay.attach(websocket, want_control)
+        finally:
+            if not relay.viewers:
+                if self._relays.get(session_id) is relay:
+                    del self._relays[session_id]
+                await relay.close()
+
+    def stats(self, session_id: str) -> Optional[Dict[str, Any]]:
+        relay = self._relays.get(session_id)
+        return relay.stats() if relay else None
+
+    @property
+    def connections(self) -> int:
+        return sum(len(relay.viewers) for relay in self._relays.values())
+
+# VNC_SHARE_UPSTREAM=false keeps ZRLE/Tight at the cost of one viewer per session
+_relay_manager = VncRelayManager(share_upstream=os.environ.get("VNC_SHARE_UPSTREAM", "true").lower() != "false")
+ACTIVE_VNC_CONNECTIONS.set_function(lambda: _relay_manager.connections)
+
+def get_vnc_relays() -> VncRelayManager:
+    return _relay_manager
@@ -0,0 +1,226 @@
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+import math
+import time
+
+# Latency buckets in seconds, from sub-millisecond hot paths to container boots
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120,
+)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+def _format_labels(key: LabelKey) -> str:
+    if not key:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in key) + "}"
+
+class Counter:
+    """A monotonically increasing count that also tracks its recent per-second rate."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: Dict[LabelKey, float] = {}
+        # (second, count) buckets for rate()
+        self._recent: deque = deque(maxlen=60)
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+        second = int(time.monotonic())
+        if self._recent and self._recent[-1][0] == second:
+            self._recent[-1][1] += amount
+        else:
+            self._recent.append([second, amount])
+
+    def rate(self, window: int = 10) -> float:
+        """Increments per second over the last `window` seconds, across all labels."""
+        since = int(time.monotonic()) - window
+        return sum(count for second, count in self._recent if second > since) / window
+
+    def samples(self) -> List[Tuple[str, LabelKey, float]]:
+        return [(self.name, key, value) for key, value in self._values.items()]
+
+    def snapshot(self) -> Dict:
+        return {
+            "total": sum(self._values.values()),
+            "rate_10s": self.rate(),
+            "by_label": {_format_labels(key) or "": value for key, value in self._values.items()},
+        }
+
+class Gauge:
+    """A value that goes up and down, or is read from a callback when collected."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: Dict[LabelKey, float] = {}
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, **labels):
+        self._values[_label_key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Callable[[], float]):
+        self._function = function
+
+    def samples(self) -> List[Tuple[str, LabelKey, float]]:
+        if self._function is not None:
+            try:
+                return [(self.name, (), float(self._function()))]
+            except Exception:
+                return []
+        return [(self.name, key, value) for key, value in self._values.items()]
+
+    def snapshot(self) -> Dict:
+        return {_format_labels(key) or "": value for _, key, value in self.samples()}
+
+class _HistogramSeries:
+    def __init__(self, buckets: Sequence[float]):
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+class Histogram:
+    """Latency distribution over fixed buckets, with estimated percentiles."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self._series: Dict[LabelKey, _HistogramSeries] = {}
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = _HistogramSeries(self.buckets)
+        series.counts[bisect_left(self.buckets, value)] += 1
+        series.sum += value
+        series.count += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observes the wall time of the `with` block."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _quantile(self, series: _HistogramSeries, q: float) -> Optional[float]:
+        if not series.count:
+            return None
+        rank = q * series.count
+        seen = 0
+        for index, count in enumerate(series.counts):
+            if seen + count >= rank and count:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else lower
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def samples(self) -> List[Tuple[str, LabelKey, float]]:
+        samples = []
+        for key, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(list(self.buckets) + [math.inf], series.counts):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else repr(bound)
+                samples.append((f"{self.name}_bucket", key + (("le", le),), cumulative))
+            samples.append((f"{self.name}_sum", key, series.sum))
+            samples.append((f"{self.name}_count", key, series.count))
+        return samples
+
+    def snapshot(self) -> Dict:
+        return {
+            _format_labels(key) or "": {
+                "count": series.count,
+                "avg": series.sum / series.count if series.count else None,
+                "p50": self._quantile(series, 0.5),
+                "p95": self._quantile(series, 0.95),
+                "p99": self._quantile(series, 0.99),
+            }
+            for key, series in self._series.items()
+        }
+
+class MetricsRegistry:
+    """Holds the process's metrics and renders them for the metrics endpoints."""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def _register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str) -> Counter:
+        return self._register(Counter(name, help))
+
+    def gauge(self, name: str, help: str) -> Gauge:
+        return self._register(Gauge(name, help))
+
+    def histogram(self, name: str, help: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, buckets))
+
+    def render_prometheus(self) -> str:
+        """Renders every metric in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, key, value in metric.samples():
+                lines.append(f"{name}{_format_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict:
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+    def reset(self):
+        """Clears counters and histograms, e.g. after a benchmark warm-up; gauges keep their current state."""
+        for metric in self._metrics.values():
+            if isinstance(metric, Counter):
+                metric._values.clear()
+                metric._recent.clear()
+            elif isinstance(metric, Histogram):
+                metric._series.clear()
+
+metrics = MetricsRegistry()
+
+SANDBOX_CREATE_SECONDS = metrics.histogram(
+    "sheikhbox_sandbox_create_seconds", "Time to get a sandbox for a new session, by source (pool or cold)")
+SANDBOX_DESTROY_SECONDS = metrics.histogram(
+    "sheikhbox_sandbox_destroy_seconds", "Time to tear down sandbox containers")
+LLM_REQUEST_SECONDS = metrics.histogram(
+    "sheikhbox_llm_request_seconds", "Duration of LLM calls until the last token, by method")
+LLM_TIME_TO_FIRST_TOKEN_SECONDS = metrics.histogram(
+    "sheikhbox_llm_time_to_first_token_seconds", "Time from an LLM stream request to its first token")
+TOOL_CALL_SECONDS = metrics.histogram(
+    "sheikhbox_tool_call_seconds", "Duration of agent tool calls, by tool and outcome")
+SSE_EVENTS_TOTAL = metrics.counter(
+    "sheikhbox_sse_events_total", "Chat SSE events sent, by event type")
+ACTIVE_SESSIONS = metrics.gauge(
+    "sheikhbox_active_sessions", "Sessions whose sandbox connection is held by this process")
+ACTIVE_CHATS = metrics.gauge(
+    "sheikhbox_active_chats", "Chats currently streaming in this process")
+ACTIVE_VNC_CONNECTIONS = metrics.gauge(
+    "sheikhbox_active_vnc_connections", "VNC viewers connected to this process")
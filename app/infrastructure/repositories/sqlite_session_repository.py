@@ -0,0 +1,242 @@
+from typing import Any, Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from app.domain.models.session import Session, SessionEvent
+from app.domain.repositories.session_repository import SessionRepository
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    title TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL,
+    sandbox_id TEXT,
+    sandbox_ip TEXT,
+    latest_message TEXT NOT NULL DEFAULT '',
+    latest_message_at INTEGER NOT NULL,
+    unread_message_count INTEGER NOT NULL DEFAULT 0,
+    created_at INTEGER NOT NULL,
+    updated_at INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_latest ON sessions (latest_message_at DESC, session_id);
+CREATE TABLE IF NOT EXISTS session_events (
+    event_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    event TEXT NOT NULL,
+    data TEXT NOT NULL,
+    created_at INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_session_events_session ON session_events (session_id, event_id);
+"""
+
+_SESSION_COLUMNS = (
+    "session_id, title, status, sandbox_id, sandbox_ip, latest_message, "
+    "latest_message_at, unread_message_count, created_at, updated_at"
+)
+
+# Length of the title derived from the first user message
+_TITLE_LENGTH = 50
+
+def _row_to_session(row: sqlite3.Row) -> Session:
+    return Session(**dict(row))
+
+class SqliteSessionRepository(SessionRepository):
+    """
+    Session store on an embedded SQLite database in WAL mode, so several
+    worker processes on one host can share it.
+
+    All statements run on one dedicated thread. Appended events are buffered
+    and written in one transaction every `flush_interval` seconds (or once
+    `max_batch` events are pending), so a busy stream does not commit per event.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 0.2, max_batch: int = 500):
+        self._path = path
+        self._flush_interval = flush_interval
+        self._max_batch = max_batch
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pending: List[SessionEvent] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self._batch_full = asyncio.Event()
+
+    # --- Plumbing ---
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self._path, check_same_thread=False, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: fn(self._connect(), *args))
+
+    # --- Sessions ---
+
+    def _create_sync(self, conn: sqlite3.Connection, session: Session):
+        conn.execute(
+            f"INSERT INTO sessions ({_SESSION_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (session.session_id, session.title, session.status, session.sandbox_id, session.sandbox_ip,
+             session.latest_message, session.latest_message_at, session.unread_message_count,
+             session.created_at, session.updated_at),
+        )
+
+    async def create(self, session: Session) -> Session:
+        now = int(time.time())
+        session = session.model_copy(update={
+            "created_at": session.created_at or now,
+            "updated_at": session.updated_at or now,
+            "latest_message_at": session.latest_message_at or now,
+        })
+        await self._run(self._create_sync, session)
+        return session
+
+    async def get(self, session_id: str) -> Optional[Session]:
+        def get_sync(conn: sqlite3.Connection):
+            return conn.execute(f"SELECT {_SESSION_COLUMNS} FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        row = await self._run(get_sync)
+        return _row_to_session(row) if row else None
+
+    async def list(self, limit: int = 50, offset: int = 0) -> List[Session]:
+        def list_sync(conn: sqlite3.Connection):
+            return conn.execute(
+                f"SELECT {_SESSION_COLUMNS} FROM sessions "
+                "ORDER BY latest_message_at DESC, session_id LIMIT ? OFFSET ?",
+                (limit, offset),
+            ).fetchall()
+        return [_row_to_session(row) for row in await self._run(list_sync)]
+
+    async def update_status(self, session_id: str, status: str):
+        def update_sync(conn: sqlite3.Connection):
+            conn.execute(
+                "UPDATE sessions SET status = ?, updated_at = ? WHERE session_id = ?",
+                (status, int(time.time()), session_id),
+            )
+        await self._run(update_sync)
+
+    async def request_stop(self, session_id: str) -> bool:
+        def request_sync(conn: sqlite3.Connection):
+            return conn.execute(
+                "UPDATE sessions SET status = 'stopping', updated_at = ? WHERE session_id = ? AND status = 'running'",
+                (int(time.time()), session_id),
+            ).rowcount > 0
+        return await self._run(request_sync)
+
+    async def mark_read(self, session_id: str):
+        def mark_sync(conn: sqlite3.Connection):
+            conn.execute("UPDATE sessions SET unread_message_count = 0 WHERE session_id = ?", (session_id,))
+        await self._run(mark_sync)
+
+    async def delete(self, session_ids: List[str]):
+        ids = set(session_ids)
+        self._pending = [event for event in self._pending if event.session_id not in ids]
+
+        def delete_sync(conn: sqlite3.Connection):
+            params = [(session_id,) for session_id in ids]
+            with conn:
+                conn.execute("BEGIN")
+                conn.executemany("DELETE FROM session_events WHERE session_id = ?", params)
+                conn.executemany("DELETE FROM sessions WHERE session_id = ?", params)
+        await self._run(delete_sync)
+
+    # --- Events ---
+
+    async def append_event(self, event: SessionEvent):
+        if not event.created_at:
+            event = event.model_copy(update={"created_at": int(time.time())})
+        self._pending.append(event)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+        if len(self._pending) >= self._max_batch:
+            self._batch_full.set()
+
+    async def _flush_loop(self):
+        while self._pending:
+            try:
+                await asyncio.wait_for(self._batch_full.wait(), timeout=self._flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._batch_full.clear()
+            await self.flush()
+
+    def _write_events_sync(self, conn: sqlite3.Connection, events: List[SessionEvent]):
+        summaries: Dict[str, Dict[str, Any]] = {}
+        for event in events:
+            summary = summaries.setdefault(event.session_id, {"messages": 0, "title": None, "latest": None})
+            summary["at"] = event.created_at
+            if event.event == "message":
+                summary["messages"] += 1
+                summary["latest"] = (str(event.data), event.created_at)
+            elif event.event == "user_message" and summary["title"] is None:
+                summary["title"] = str(event.data)[:_TITLE_LENGTH]
+                summary["latest"] = (str(event.data), event.created_at)
+
+        with conn:
+            conn.execute("BEGIN")
+            conn.executemany(
+                "INSERT INTO session_events (session_id, event, data, created_at) VALUES (?, ?, ?, ?)",
+                [(event.session_id, event.event, json.dumps(event.data), event.created_at) for event in events],
+            )
+            for session_id, summary in summaries.items():
+                if summary["latest"]:
+                    conn.execute(
+                        "UPDATE sessions SET latest_message = ?, latest_message_at = ? WHERE session_id = ?",
+                        (*summary["latest"], session_id),
+                    )
+                if summary["title"]:
+                    conn.execute(
+                        "UPDATE sessions SET title = ? WHERE session_id = ? AND title = ''",
+                        (summary["title"], session_id),
+                    )
+                conn.execute(
+                    "UPDATE sessions SET unread_message_count = unread_message_count + ?, updated_at = ? "
+                    "WHERE session_id = ?",
+                    (summary["messages"], summary["at"], session_id),
+                )
+
+    async def flush(self):
+        """Writes all pending events in one transaction."""
+        events, self._pending = self._pending, []
+        if not events:
+            return
+        try:
+            await self._run(self._write_events_sync, events)
+        except Exception as e:
+            logger.error(f"Failed to write {len(events)} session events: {e}")
+
+    async def get_events(self, session_id: str, after_event_id: int = 0, limit: int = 1000) -> List[SessionEvent]:
+        await self.flush()
+
+        def get_sync(conn: sqlite3.Connection):
+            return conn.execute(
+                "SELECT event_id, session_id, event, data, created_at FROM session_events "
+                "WHERE session_id = ? AND event_id > ? ORDER BY event_id LIMIT ?",
+                (session_id, after_event_id, limit),
+            ).fetchall()
+        rows = await self._run(get_sync)
+        return [SessionEvent(**dict(row, data=json.loads(row["data"]))) for row in rows]
+
+    async def close(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        await self.flush()
+
+        def close_sync(conn: sqlite3.Connection):
+            conn.close()
+        if self._conn is not None:
+            await self._run(close_sync)
+            self._conn = None
+        self._executor.shutdown(wait=True)
@@ -1,10 +1,22 @@
-from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse
 from sse_starlette.sse import EventSourceResponse
-import websockets
+from starlette.websockets import WebSocketState
 from app.application.services.session_service import SessionService
 from app.application.services.chat_service import ChatService
+from app.infrastructure.external.sandbox.docker_sandbox import (
+    close_sandbox_api_stub, get_docker_control, get_sandbox_api_stub, get_sandbox_pool, get_settings,
+)
+from app.infrastructure.external.browser.browser_cache import get_browser_cache
+from app.infrastructure.external.browser.playwright_driver import get_playwright_driver
+from app.infrastructure.external.llm.fake_llm import FakeLLM
+from app.infrastructure.external.vnc.vnc_relay import get_vnc_relays
+from app.infrastructure.metrics import ACTIVE_SESSIONS, SSE_EVENTS_TOTAL, metrics
 import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title="SheikhBox: Intelligent Conversation Agent API",
@@ -13,10 +25,13 @@ app = FastAPI(
 )
 
 session_service = SessionService()
-chat_service = ChatService(session_service)
+ACTIVE_SESSIONS.set_function(lambda: session_service.active_sessions)
+# LLM_PROVIDER=fake runs the chat loop against a scripted offline LLM
+chat_service = ChatService(session_service, llm=FakeLLM() if os.environ.get("LLM_PROVIDER") == "fake" else None)
 
 # --- Pydantic Models for API ---
 from pydantic import BaseModel
+from typing import List
 
 class ChatRequest(BaseModel):
     message: str
@@ -24,6 +39,54 @@ class ChatRequest(BaseModel):
 class SessionResponse(BaseModel):
     session_id: str
 
+class DeleteSessionsRequest(BaseModel):
+    session_ids: List[str]
+
+# --- Lifecycle ---
+
+@app.on_event("startup")
+async def start_docker_events():
+    await get_docker_control().start_events()
+
+@app.on_event("startup")
+async def start_sandbox_api_stub():
+    # Fails fast when the stub is configured against real Docker sandboxes
+    if get_settings().sandbox_api_backend == "stub":
+        get_sandbox_api_stub()
+
+@app.on_event("startup")
+async def start_sandbox_pool():
+    pool = get_sandbox_pool()
+    if pool:
+        await pool.start()
+
+@app.on_event("startup")
+async def start_browser_cache():
+    await get_browser_cache().start()
+
+@app.on_event("shutdown")
+async def stop_sandbox_pool():
+    pool = get_sandbox_pool()
+    if pool:
+        await pool.stop()
+
+@app.on_event("shutdown")
+async def stop_browsers():
+    await get_browser_cache().close()
+    await get_playwright_driver().stop()
+
+@app.on_event("shutdown")
+async def close_sessions():
+    await session_service.close()
+
+@app.on_event("shutdown")
+async def stop_docker_control():
+    await get_docker_control().close()
+
+@app.on_event("shutdown")
+async def stop_sandbox_api_stub():
+    await close_sandbox_api_stub()
+
 # --- API Endpoints ---
 
 @app.put("/api/v1/sessions", response_model=SessionResponse, status_code=201)
@@ -31,61 +94,98 @@ async def create_session():
     session_id = await session_service.create_session()
     return {"session_id": session_id}
 
+@app.get("/api/v1/sessions")
+async def list_sessions(limit: int = 50, offset: int = 0):
+    sessions = await session_service.list_sessions(limit=limit, offset=offset)
+    return {"code": 0, "msg": "success", "data": {"sessions": [
+        {
+            "session_id": session.session_id,
+            "title": session.title,
+            "latest_message": session.latest_message,
+            "latest_message_at": session.latest_message_at,
+            "status": session.status,
+            "unread_message_count": session.unread_message_count,
+        }
+        for session in sessions
+    ]}}
+
+@app.get("/api/v1/sessions/{session_id}")
+async def get_session(session_id: str, after_event_id: int = 0, limit: int = 1000):
+    if limit < 1 or limit > 10000:
+        raise HTTPException(status_code=422, detail="limit must be between 1 and 10000")
+    session, events, next_event_id = await session_service.get_session(
+        session_id, after_event_id=after_event_id, limit=limit)
+    return {"code": 0, "msg": "success", "data": {
+        "session_id": session.session_id,
+        "title": session.title,
+        "events": [
+            {"event_id": event.event_id, "event": event.event, "data": event.data, "created_at": event.created_at}
+            for event in events
+        ],
+        "next_event_id": next_event_id,
+    }}
+
 @app.delete("/api/v1/sessions/{session_id}", status_code=204)
 async def delete_session(session_id: str):
+    await chat_service.release(session_id)
     await session_service.delete_session(session_id)
     return {}
 
+@app.post("/api/v1/sessions/batch_delete")
+async def delete_sessions(request: DeleteSessionsRequest):
+    for session_id in request.session_ids:
+        await chat_service.release(session_id)
+    results = await session_service.delete_sessions(request.session_ids)
+    return {"code": 0, "msg": "success", "data": {"deleted": [id for id, ok in results.items() if ok]}}
+
+@app.get("/api/v1/sandboxes/pool")
+async def get_sandbox_pool_stats():
+    pool = get_sandbox_pool()
+    return {"code": 0, "msg": "success", "data": pool.stats() if pool else None}
+
 @app.post("/api/v1/sessions/{session_id}/chat")
 async def chat_with_session(session_id: str, request: ChatRequest):
     async def event_stream():
+        # EventSourceResponse only pulls the next event once the previous one
+        # was sent, and cancels this generator when the client disconnects,
+        # which in turn cancels the upstream LLM generation.
         async for event in chat_service.chat(session_id, request.message):
-            yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+            SSE_EVENTS_TOTAL.inc(event=event["event"])
+            yield {"event": event["event"], "data": json.dumps(event["data"])}
     
     return EventSourceResponse(event_stream())
 
+@app.post("/api/v1/sessions/{session_id}/stop")
+async def stop_session(session_id: str):
+    stopped = await chat_service.stop(session_id)
+    return {"code": 0, "msg": "success", "data": {"stopped": stopped}}
+
 @app.websocket("/api/v1/sessions/{session_id}/vnc")
-async def vnc_proxy(session_id: str, websocket: WebSocket):
+async def vnc_proxy(session_id: str, websocket: WebSocket, control: bool = True):
     await websocket.accept(subprotocol="binary")
     try:
         sandbox = await session_service.get_session_sandbox(session_id)
-        # The sandbox's _vnc_url is a ws:// URL
-        vnc_url = sandbox._vnc_url 
-        
-        async with websockets.connect(vnc_url, subprotocols=["binary"]) as remote_ws:
-            # Forward messages in both directions
-            consumer_task = asyncio.create_task(
-                _forward_messages(websocket, remote_ws, "client_to_server")
-            )
-            producer_task = asyncio.create_task(
-                _forward_messages(remote_ws, websocket, "server_to_client")
-            )
-            done, pending = await asyncio.wait(
-                [consumer_task, producer_task],
-                return_when=asyncio.FIRST_COMPLETED,
-            )
-            for task in pending:
-                task.cancel()
-
+        # The sandbox's _vnc_url is a ws:// URL; viewers of one session share a single upstream connection
+        await get_vnc_relays().attach(session_id, sandbox._vnc_url, websocket, want_control=control)
     except WebSocketDisconnect:
-        print(f"Client disconnected from VNC for session {session_id}")
+        logger.info(f"Client disconnected from VNC for session {session_id}")
     except Exception as e:
-        print(f"An error occurred in VNC proxy for session {session_id}: {e}")
+        logger.error(f"An error occurred in VNC proxy for session {session_id}: {e}")
     finally:
-        if not websocket.client_state == "DISCONNECTED":
+        if websocket.client_state != WebSocketState.DISCONNECTED and websocket.application_state != WebSocketState.DISCONNECTED:
             await websocket.close()
 
-async def _forward_messages(source: WebSocket, dest: WebSocket, direction: str):
-    while True:
-        try:
-            message = await source.receive_bytes()
-            await dest.send_bytes(message)
-        except (WebSocketDisconnect, websockets.exceptions.ConnectionClosed):
-            print(f"Connection closed in direction: {direction}")
-            break
-        except Exception as e:
-            print(f"Error forwarding message in {direction}: {e}")
-            break
+@app.get("/api/v1/sessions/{session_id}/vnc/stats")
+async def vnc_stats(session_id: str):
+    return {"code": 0, "msg": "success", "data": get_vnc_relays().stats(session_id)}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return metrics.render_prometheus()
+
+@app.get("/api/v1/metrics")
+async def get_metrics():
+    return {"code": 0, "msg": "success", "data": metrics.snapshot()}
 
 # --- Exception Handling ---
 @app.exception_handler(ValueError)
@@ -0,0 +1,271 @@
+"""
+End-to-end benchmark of the SheikhBox API. Serves app.main with uvicorn on a
+local port, backed by in-process fakes for Docker (FakeDockerClient), the
+sandbox API (sandbox_api_stub), CDP (FakeBrowser) and Gemini (FakeLLM), and
+drives create session -> chat over SSE -> delete session at a configurable
+concurrency.
+
+Reports p50/p95/p99 latency and throughput per operation plus the server's
+own metrics, and writes them as JSON so two commits can be compared:
+
+    python -m benchmarks.bench_api --sessions 200 --concurrency 16 --output before.json
+    python -m benchmarks.bench_api --sessions 200 --concurrency 16 --compare before.json
+"""
+from typing import Any, Dict, List, Optional
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import socket
+import subprocess
+import tempfile
+import time
+
+# Metrics compared by --compare; True when higher is better
+_COMPARED = {"p50": False, "p95": False, "p99": False, "throughput": True}
+
+def configure_environment(args: argparse.Namespace, root: str):
+    """Points every backend of the app at its local fake. Must run before app.main is imported."""
+    os.environ.update({
+        "LLM_PROVIDER": "fake",
+        "SANDBOX_DOCKER_BACKEND": "fake",
+        "SANDBOX_FAKE_DOCKER_LATENCY": str(args.docker_latency),
+        "SANDBOX_API_BACKEND": "stub",
+        "SANDBOX_API_STUB_ROOT": os.path.join(root, "sandboxes"),
+        "SANDBOX_POOL_SIZE": str(args.pool_size),
+        "BROWSER_BACKEND": "fake",
+        "FAKE_BROWSER_LATENCY": str(args.browser_latency),
+        "SESSION_DB_PATH": os.path.join(root, "sheikhbox.db"),
+    })
+
+def make_responder(args: argparse.Namespace):
+    """Scripted agent: one turn of concurrent tool calls, then a plain-text answer."""
+    tool_calls = json.dumps({
+        "plan": ["Open the page", "Read it", "Run a command", "Save a note"],
+        "tool_calls": [
+            {"id": "1", "tool": "navigate", "args": {"url": "https://example.com"}},
+            {"id": "2", "tool": "view_page", "args": {}},
+            {"id": "3", "tool": "exec_command", "args": {"command": "echo benchmark", "exec_dir": "/"}},
+            {"id": "4", "tool": "file_write", "args": {"file": "/notes.txt", "content": "benchmark " * 100}},
+        ],
+    })
+    answer = " ".join(f"word{i}" for i in range(args.answer_tokens))
+
+    def respond(messages: List[Dict[str, str]]) -> str:
+        if args.no_tools or messages[-1]["content"].startswith("Tool results:"):
+            return answer
+        return tool_calls
+    return respond
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Linear-interpolated percentile of `values`, `q` in [0, 100]."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    low, high = math.floor(rank), math.ceil(rank)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+class Recorder:
+    """Collects per-operation latencies and errors."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.counters: Dict[str, int] = {}
+
+    def record(self, op: str, seconds: float):
+        self.latencies.setdefault(op, []).append(seconds)
+
+    def fail(self, op: str):
+        self.errors[op] = self.errors.get(op, 0) + 1
+
+    def count(self, name: str, amount: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def summary(self, wall: float) -> Dict[str, Any]:
+        ops = {}
+        for op in sorted(set(self.latencies) | set(self.errors)):
+            values = self.latencies.get(op, [])
+            ops[op] = {
+                "count": len(values),
+                "errors": self.errors.get(op, 0),
+                "mean": sum(values) / len(values) if values else None,
+                "p50": percentile(values, 50),
+                "p95": percentile(values, 95),
+                "p99": percentile(values, 99),
+                "max": max(values) if values else None,
+                "throughput": len(values) / wall if wall else None,
+            }
+        return {
+            "wall_seconds": wall,
+            "operations": ops,
+            "counters": self.counters,
+            "sse_events_per_second": self.counters.get("sse_events", 0) / wall if wall else None,
+        }
+
+async def run_session(client, args: argparse.Namespace, recorder: Recorder):
+    """One virtual user: create a session, chat once over SSE, delete the session."""
+    started = time.perf_counter()
+    response = await client.put("/api/v1/sessions")
+    if response.status_code != 201:
+        recorder.fail("create_session")
+        return
+    recorder.record("create_session", time.perf_counter() - started)
+    session_id = response.json()["session_id"]
+
+    started = time.perf_counter()
+    first_event = first_delta = None
+    events = 0
+    try:
+        async with client.stream(
+            "POST", f"/api/v1/sessions/{session_id}/chat", json={"message": args.message},
+        ) as stream:
+            stream.raise_for_status()
+            async for line in stream.aiter_lines():
+                if not line.startswith("event:"):
+                    continue
+                events += 1
+                now = time.perf_counter() - started
+                if first_event is None:
+                    first_event = now
+                if first_delta is None and line.split(":", 1)[1].strip() == "message_delta":
+                    first_delta = now
+        recorder.record("chat", time.perf_counter() - started)
+        if first_event is not None:
+            recorder.record("chat_first_event", first_event)
+        if first_delta is not None:
+            recorder.record("chat_first_delta", first_delta)
+        recorder.count("sse_events", events)
+    except Exception:
+        recorder.fail("chat")
+
+    started = time.perf_counter()
+    response = await client.delete(f"/api/v1/sessions/{session_id}")
+    if response.status_code == 204:
+        recorder.record("delete_session", time.perf_counter() - started)
+    else:
+        recorder.fail("delete_session")
+
+async def run_load(client, args: argparse.Namespace, sessions: int, recorder: Recorder) -> float:
+    remaining = iter(range(sessions))
+
+    async def worker():
+        for _ in remaining:
+            await run_session(client, args, recorder)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    return time.perf_counter() - started
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory(prefix="sheikhbox-bench-") as root:
+        configure_environment(args, root)
+        import httpx
+        import uvicorn
+        import app.main as api
+        from app.application.services.chat_service import ChatService
+        from app.infrastructure.external.llm.fake_llm import FakeLLM
+        from app.infrastructure.metrics import metrics
+
+        api.chat_service = ChatService(api.session_service, llm=FakeLLM(
+            responder=make_responder(args),
+            first_token_delay=args.llm_first_token_delay,
+            token_delay=args.llm_token_delay,
+        ))
+
+        port = _free_port()
+        server = uvicorn.Server(uvicorn.Config(api.app, host="127.0.0.1", port=port, log_level="warning"))
+        serving = asyncio.create_task(server.serve())
+        while not server.started:
+            if serving.done():
+                serving.result()
+            await asyncio.sleep(0.01)
+
+        try:
+            limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency * 2)
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=None, limits=limits) as client:
+                if args.warmup:
+                    await run_load(client, args, args.warmup, Recorder())
+                metrics.reset()
+                recorder = Recorder()
+                wall = await run_load(client, args, args.sessions, recorder)
+                server_metrics = (await client.get("/api/v1/metrics")).json()["data"]
+        finally:
+            server.should_exit = True
+            await serving
+
+    return {
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        **recorder.summary(wall),
+        "server_metrics": server_metrics,
+    }
+
+def _ms(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value * 1000:.1f}"
+
+def print_report(result: Dict[str, Any]):
+    print(f"revision {result['revision'] or '?'}  wall {result['wall_seconds']:.2f}s  "
+          f"SSE events/s {result['sse_events_per_second']:.1f}")
+    print(f"{'operation':<18}{'count':>7}{'errors':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'ops/s':>9}")
+    for op, stats in result["operations"].items():
+        print(f"{op:<18}{stats['count']:>7}{stats['errors']:>7}{_ms(stats['p50']):>10}{_ms(stats['p95']):>10}"
+              f"{_ms(stats['p99']):>10}{_ms(stats['max']):>10}{stats['throughput'] or 0:>9.1f}")
+
+def print_comparison(result: Dict[str, Any], baseline: Dict[str, Any]):
+    print(f"\nchange vs {baseline.get('revision') or 'baseline'} (negative latency / positive throughput is better)")
+    for op, stats in result["operations"].items():
+        before = baseline.get("operations", {}).get(op)
+        if not before:
+            continue
+        changes = []
+        for key in _COMPARED:
+            if before.get(key) and stats.get(key) is not None:
+                changes.append(f"{key} {100 * (stats[key] - before[key]) / before[key]:+.1f}%")
+        print(f"{op:<18}{'  '.join(changes)}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the SheikhBox API against local fakes")
+    parser.add_argument("--sessions", type=int, default=100, help="sessions to run through create/chat/delete")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent virtual users")
+    parser.add_argument("--warmup", type=int, default=5, help="sessions run before measuring")
+    parser.add_argument("--pool-size", type=int, default=0, help="warm sandbox pool size")
+    parser.add_argument("--docker-latency", type=float, default=0.0, help="seconds per fake Docker call")
+    parser.add_argument("--browser-latency", type=float, default=0.0, help="seconds per fake browser call")
+    parser.add_argument("--llm-first-token-delay", type=float, default=0.05)
+    parser.add_argument("--llm-token-delay", type=float, default=0.002)
+    parser.add_argument("--answer-tokens", type=int, default=200, help="words in the final answer")
+    parser.add_argument("--no-tools", action="store_true", help="answer directly, without tool calls")
+    parser.add_argument("--message", default="Summarize example.com and save a note.")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of a previous run to compare against")
+    args = parser.parse_args()
+
+    result = asyncio.run(benchmark(args))
+    print_report(result)
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(result, json.load(f))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import asyncio
+import json
+from app.application.services.agent_executor import AgentExecutor
+from app.domain.models.tool_result import ToolResult
+from app.domain.services.tool_registry import Tool, ToolRegistry
+from app.infrastructure.external.llm.fake_llm import FakeLLM
+
+class _Sandbox:
+    id = "sb-1"
+
+async def _events(executor: AgentExecutor, message: str = "go"):
+    return [event async for event in executor.run("s-1", _Sandbox(), message, asyncio.Event())]
+
+def test_json_answer_without_tool_calls_is_delivered():
+    async def main():
+        answer = json.dumps({"name": "Ada", "born": 1815})
+        executor = AgentExecutor(FakeLLM(responses=[answer]), ToolRegistry())
+        assert await _events(executor) == [{"event": "message", "data": answer}]
+    asyncio.run(main())
+
+def test_stream_errors_become_an_error_event():
+    class _FailingLLM(FakeLLM):
+        async def ask_stream(self, messages):
+            yield "partial"
+            raise RuntimeError("quota exceeded")
+
+    async def main():
+        events = await _events(AgentExecutor(_FailingLLM(), ToolRegistry()))
+        assert events[-1] == {"event": "error", "data": "LLM request failed: quota exceeded"}
+    asyncio.run(main())
+
+def test_resource_locks_are_shared_by_runs_in_one_sandbox():
+    running = []
+    overlapped = []
+
+    async def browse(context):
+        running.append(context.session_id)
+        overlapped.append(len(running) > 1)
+        await asyncio.sleep(0.05)
+        running.remove(context.session_id)
+        return ToolResult(success=True)
+
+    def responder(messages):
+        if len(messages) > 2:
+            return "done"
+        return json.dumps({"tool": "browse", "args": {}})
+
+    async def main():
+        registry = ToolRegistry()
+        registry.register(Tool("browse", "Uses the browser", {}, browse, resource="browser"))
+        executor = AgentExecutor(FakeLLM(responder=responder), registry)
+        sandbox, stop = _Sandbox(), asyncio.Event()
+
+        async def chat(session_id: str):
+            return [event async for event in executor.run(session_id, sandbox, "go", stop)]
+
+        await asyncio.gather(chat("s-1"), chat("s-2"))
+        assert overlapped == [False, False]
+        executor.release(sandbox.id)
+        assert sandbox.id not in executor._resource_locks
+    asyncio.run(main())
@@ -0,0 +1,17 @@
+import asyncio
+from app.infrastructure.external.browser.browser_cache import BrowserConnectionCache
+from app.infrastructure.external.browser.fake_browser import FakeBrowser
+
+def test_evict_idle_skips_browser_with_operation_in_flight():
+    async def main():
+        cache = BrowserConnectionCache(idle_timeout=0.05, browser_factory=lambda url: FakeBrowser(url, latency=0.2))
+        browser = cache.get("sb", "http://sb:9222")
+        view = asyncio.create_task(browser.view_page())
+        await asyncio.sleep(0.1)
+        assert await cache.evict_idle() == []
+        assert (await view).success
+        # Idleness counts from the end of the operation, not from get()
+        assert await cache.evict_idle() == []
+        await asyncio.sleep(0.1)
+        assert await cache.evict_idle() == ["sb"]
+    asyncio.run(main())
@@ -0,0 +1,45 @@
+import asyncio
+from app.application.services.chat_service import ChatService
+from app.domain.services.tool_registry import ToolRegistry
+from app.infrastructure.external.llm.fake_llm import FakeLLM
+
+class _Sandbox:
+    id = "sb-1"
+
+class _SessionService:
+    def __init__(self):
+        self.status = "pending"
+
+    async def get_session_sandbox(self, session_id):
+        return _Sandbox()
+
+    async def record_event(self, session_id, event, data):
+        pass
+
+    async def update_status(self, session_id, status):
+        self.status = status
+
+    async def request_stop(self, session_id):
+        return False
+
+    async def stop_requested(self, session_id):
+        return False
+
+def test_stop_reaches_every_chat_of_a_session():
+    async def main():
+        sessions = _SessionService()
+        service = ChatService(sessions, llm=FakeLLM(responses=["x" * 400], token_delay=0.01),
+                              registry=ToolRegistry(), stop_poll_interval=10)
+
+        async def chat():
+            return [event async for event in service.chat("s-1", "go")]
+
+        chats = [asyncio.create_task(chat()), asyncio.create_task(chat())]
+        await asyncio.sleep(0.1)
+        assert await service.stop("s-1")
+        # Both stop long before the 100 chunks of the reply are generated
+        first, second = await asyncio.wait_for(asyncio.gather(*chats), 0.5)
+        assert first[-1]["event"] == second[-1]["event"] == "done"
+        assert sessions.status == "completed"
+        assert not await service.stop("s-1")
+    asyncio.run(main())
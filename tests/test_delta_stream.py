@@ -0,0 +1,65 @@
+import asyncio
+import pytest
+from app.application.services.delta_stream import DeltaStream
+
+async def _source(deltas, produced=None, delay=0.0, error=None):
+    for delta in deltas:
+        if produced is not None:
+            produced.append(delta)
+        yield delta
+        if delay:
+            await asyncio.sleep(delay)
+    if error:
+        raise error
+
+def test_merges_deltas_while_consumer_is_busy():
+    async def main():
+        stream = DeltaStream(_source(["a", "b", "c", "d"], delay=0.01))
+        chunks = []
+        async for chunk in stream:
+            chunks.append(chunk)
+            await asyncio.sleep(0.05)
+        assert "".join(chunks) == stream.text == "abcd"
+        assert len(chunks) < 4
+    asyncio.run(main())
+
+def test_stops_pulling_once_max_pending_chars_are_buffered():
+    async def main():
+        produced = []
+        stream = DeltaStream(_source(["xx"] * 10, produced), max_pending_chars=4)
+        chunks = stream.__aiter__()
+        first = await chunks.__anext__()
+        await asyncio.sleep(0.05)
+        # Two deltas were handed out, two more fill the buffer, and the fifth
+        # waits for room instead of the source being drained
+        assert first == "xxxx"
+        assert stream._pending_chars == 4
+        assert len(produced) == 5
+        rest = [chunk async for chunk in chunks]
+        assert first + "".join(rest) == "xx" * 10
+    asyncio.run(main())
+
+def test_cancel_stops_generation_and_ends_the_stream():
+    async def main():
+        produced = []
+        stream = DeltaStream(_source(["t"] * 100, produced, delay=0.01))
+        chunks = []
+        async for chunk in stream:
+            chunks.append(chunk)
+            if len(stream.text) >= 3:
+                stream.cancel()
+        await asyncio.sleep(0.05)
+        assert stream.cancelled
+        assert len(produced) < 100
+        assert "".join(chunks) == stream.text
+    asyncio.run(main())
+
+def test_reraises_source_errors_after_buffered_deltas():
+    async def main():
+        stream = DeltaStream(_source(["par", "tial"], error=RuntimeError("quota exceeded")))
+        chunks = []
+        with pytest.raises(RuntimeError, match="quota exceeded"):
+            async for chunk in stream:
+                chunks.append(chunk)
+        assert "".join(chunks) == "partial"
+    asyncio.run(main())
@@ -0,0 +1,93 @@
+import asyncio
+import pytest
+from docker.errors import NotFound
+from app.infrastructure.external.sandbox.docker_control import DockerControlPlane
+from app.infrastructure.external.sandbox.fake_docker import FakeDockerClient
+
+LABEL = "sheikhbox.sandbox"
+
+def _control_plane(client: FakeDockerClient) -> DockerControlPlane:
+    return DockerControlPlane(client_factory=lambda: client, label=LABEL, max_workers=2)
+
+async def _run(control: DockerControlPlane, name: str, labelled: bool = True):
+    labels = {LABEL: "true"} if labelled else {}
+    return await control.run_container({"image": "sandbox", "name": name, "detach": True, "labels": labels})
+
+async def _until(condition, timeout: float = 2):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline
+        await asyncio.sleep(0.01)
+
+def test_inspect_answers_from_cache_only_while_events_are_live():
+    async def main():
+        client = FakeDockerClient()
+        control = _control_plane(client)
+        info = await _run(control, "sb-1")
+        assert info.running and info.ip
+
+        calls = client.calls
+        await control.inspect("sb-1")
+        assert client.calls == calls + 1
+
+        await control.start_events()
+        await _until(lambda: control._events_live)
+        calls = client.calls
+        assert (await control.inspect("sb-1")).ip == info.ip
+        assert client.calls == calls
+        await control.close()
+    asyncio.run(main())
+
+def test_die_and_destroy_events_update_the_cache():
+    async def main():
+        client = FakeDockerClient()
+        control = _control_plane(client)
+        await _run(control, "sb-1")
+        await _run(control, "sb-2")
+        await control.start_events()
+        await _until(lambda: control._events_live)
+
+        client.containers.get("sb-1").stop()
+        await _until(lambda: not control._containers["sb-1"].running)
+        assert control._containers["sb-1"].ip is None
+
+        client.containers.get("sb-2").remove(force=True)
+        await _until(lambda: "sb-2" not in control._containers)
+        with pytest.raises(NotFound):
+            await control.inspect("sb-2")
+        await control.close()
+    asyncio.run(main())
+
+def test_events_stream_only_follows_labelled_containers():
+    async def main():
+        client = FakeDockerClient()
+        control = _control_plane(client)
+        await control.start_events()
+        await _until(lambda: control._events_live)
+        await _run(control, "other", labelled=False)
+        other = control._containers["other"]
+
+        client.containers.get("other").stop()
+        await _run(control, "sb-1")
+        client.containers.get("sb-1").stop()
+        await _until(lambda: not control._containers["sb-1"].running)
+        assert other.running
+        await control.close()
+    asyncio.run(main())
+
+def test_remove_many_only_removes_sandbox_containers():
+    async def main():
+        client = FakeDockerClient()
+        control = _control_plane(client)
+        await _run(control, "sb-1")
+        await _run(control, "sb-2")
+        await _run(control, "prod-db", labelled=False)
+
+        results = await control.remove_many(["sb-1", "sb-2", "prod-db", "missing"])
+        assert results == {"sb-1": True, "sb-2": True, "prod-db": False, "missing": True}
+        assert set(client._containers) == {"prod-db"}
+        # ID prefixes resolve to the same container and are refused as well
+        assert not await control.remove(client._containers["prod-db"].id[:6])
+        assert "prod-db" in client._containers
+        await control.close()
+    asyncio.run(main())
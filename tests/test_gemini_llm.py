@@ -0,0 +1,17 @@
+from types import SimpleNamespace
+import pytest
+from app.infrastructure.external.llm.gemini_llm import GeminiLLM
+
+def _chunk(*texts, block_reason=0):
+    parts = [SimpleNamespace(text=text) for text in texts]
+    candidates = [SimpleNamespace(content=SimpleNamespace(parts=parts))] if texts or not block_reason else []
+    return SimpleNamespace(candidates=candidates, prompt_feedback=SimpleNamespace(block_reason=block_reason))
+
+def test_chunk_text_joins_text_parts_and_skips_empty_chunks():
+    assert GeminiLLM._chunk_text(_chunk("Hel", "lo")) == "Hello"
+    assert GeminiLLM._chunk_text(_chunk()) == ""
+    assert GeminiLLM._chunk_text(SimpleNamespace(candidates=[], prompt_feedback=None)) == ""
+
+def test_chunk_text_raises_on_blocked_prompt():
+    with pytest.raises(ValueError, match="blocked"):
+        GeminiLLM._chunk_text(_chunk(block_reason=1))
@@ -0,0 +1,32 @@
+import asyncio
+import os
+import httpx
+import pytest
+from app.infrastructure.external.sandbox import docker_sandbox
+from app.infrastructure.external.sandbox.sandbox_api_stub import SandboxApiStubServer
+
+def test_remove_kills_commands_and_deletes_the_sandbox_directory(tmp_path):
+    async def main():
+        stub = SandboxApiStubServer(str(tmp_path))
+        async with httpx.AsyncClient(base_url=stub.url_for("sb-1")) as client:
+            response = await client.put("/api/v1/file", params={"path": "/a.txt"}, content=b"hello")
+            assert response.status_code < 300
+            command = asyncio.create_task(client.post(
+                "/api/v1/shell/exec", json={"session_id": "s", "exec_id": "e", "command": "sleep 30"}, timeout=10))
+            await asyncio.sleep(0.3)
+            assert (tmp_path / "sb-1" / "a.txt").exists()
+
+            await stub.remove("sb-1")
+            assert not (tmp_path / "sb-1").exists()
+            response = await asyncio.wait_for(command, 5)
+            assert '"exit_code": -9' in response.text
+        await stub.remove("..")
+        assert tmp_path.exists()
+        await stub.close()
+    asyncio.run(main())
+
+def test_stub_requires_the_fake_docker_backend(monkeypatch):
+    monkeypatch.setattr(docker_sandbox.Settings, "sandbox_docker_backend", "docker")
+    monkeypatch.setattr(docker_sandbox, "_sandbox_api_stub", None)
+    with pytest.raises(RuntimeError, match="SANDBOX_DOCKER_BACKEND=fake"):
+        docker_sandbox.get_sandbox_api_stub()
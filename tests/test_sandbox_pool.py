@@ -0,0 +1,52 @@
+import asyncio
+import time
+from app.infrastructure.external.sandbox.sandbox_pool import SandboxPool, _PooledSandbox
+
+class _Sandbox:
+    def __init__(self, id: str, ready: bool = True):
+        self.id = id
+        self.ready = ready
+        self.destroyed = False
+
+    async def is_ready(self) -> bool:
+        return self.ready
+
+    async def destroy(self) -> bool:
+        self.destroyed = True
+        return True
+
+def _pool(*sandboxes: _Sandbox, probe=None) -> SandboxPool:
+    pool = SandboxPool(factory=None, size=0, ttl_seconds=3600, min_remaining_seconds=60, probe=probe)
+    for sandbox in sandboxes:
+        pool._idle.append(_PooledSandbox(sandbox, booted_at=time.monotonic()))
+    return pool
+
+def test_acquire_skips_dead_sandboxes():
+    async def main():
+        dead, alive = _Sandbox("dead", ready=False), _Sandbox("alive")
+        pool = _pool(dead, alive)
+        assert await pool.acquire() is alive
+        assert dead.destroyed and not alive.destroyed
+        stats = pool.stats()
+        assert (stats["hits"], stats["dead"], stats["idle"]) == (1, 1, 0)
+    asyncio.run(main())
+
+def test_acquire_misses_when_every_sandbox_is_dead():
+    async def main():
+        pool = _pool(_Sandbox("a", ready=False), _Sandbox("b", ready=False))
+        assert await pool.acquire() is None
+        stats = pool.stats()
+        assert (stats["misses"], stats["dead"]) == (1, 2)
+    asyncio.run(main())
+
+def test_acquire_uses_the_configured_probe():
+    async def main():
+        stopped, running = _Sandbox("stopped"), _Sandbox("running", ready=False)
+        # A container check that ignores is_ready() entirely
+        pool = _pool(stopped, running, probe=lambda sandbox: _answer(sandbox.id == "running"))
+        assert await pool.acquire() is running
+        assert stopped.destroyed
+    asyncio.run(main())
+
+async def _answer(value: bool) -> bool:
+    return value
@@ -0,0 +1,50 @@
+import asyncio
+import pytest
+from app.application.services import session_service as session_service_module
+from app.application.services.session_service import SessionService
+from app.domain.models.session import Session
+from app.infrastructure.external.sandbox.docker_control import DockerControlPlane
+from app.infrastructure.external.sandbox.fake_docker import FakeDockerClient
+from app.infrastructure.repositories.sqlite_session_repository import SqliteSessionRepository
+
+@pytest.fixture
+def docker(monkeypatch):
+    client = FakeDockerClient()
+    control = DockerControlPlane(client_factory=lambda: client, label="sheikhbox.sandbox", max_workers=2)
+    monkeypatch.setattr(session_service_module, "get_docker_control", lambda: control)
+    return client, control
+
+async def _service(tmp_path, control, stored_ip: str) -> SessionService:
+    info = await control.run_container({"image": "sandbox", "name": "sb-1", "labels": {"sheikhbox.sandbox": "true"}})
+    service = SessionService(SqliteSessionRepository(str(tmp_path / "sessions.db")))
+    await service.repository.create(Session(session_id="s-1", sandbox_id=info.name, sandbox_ip=stored_ip))
+    return service
+
+def test_sandbox_address_comes_from_the_control_plane(tmp_path, docker):
+    client, control = docker
+
+    async def main():
+        service = await _service(tmp_path, control, stored_ip="10.9.9.9")
+        sandbox = await service.get_session_sandbox("s-1")
+        assert sandbox.ip == client._containers["sb-1"]._ip != "10.9.9.9"
+        assert await service.get_session_sandbox("s-1") is sandbox
+        await service.close()
+        await control.close()
+    asyncio.run(main())
+
+def test_session_whose_container_is_gone_is_ended(tmp_path, docker):
+    client, control = docker
+
+    async def main():
+        service = await _service(tmp_path, control, stored_ip="10.9.9.9")
+        await service.get_session_sandbox("s-1")
+        client.containers.get("sb-1").remove(force=True)
+        with pytest.raises(ValueError):
+            await service.get_session_sandbox("s-1")
+        assert service.active_sessions == 0
+        assert (await service.repository.get("s-1")).status == "ended"
+        with pytest.raises(ValueError, match="Session not found"):
+            await service.get_session_sandbox("missing")
+        await service.close()
+        await control.close()
+    asyncio.run(main())
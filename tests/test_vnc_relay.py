@@ -0,0 +1,274 @@
+import asyncio
+import struct
+from app.infrastructure.external.vnc.vnc_relay import (
+    VncRelay, VncViewer, _ClientStream, _Piece, _ServerStream, _filter_encodings, _parse_server_init,
+)
+
+PIXEL_FORMAT = struct.pack(">BBBBHHHBBB3x", 32, 24, 0, 1, 255, 255, 255, 16, 8, 0)
+SERVER_INIT = struct.pack(">HH", 4, 4) + PIXEL_FORMAT + struct.pack(">I", 4) + b"test"
+# Server side of a 3.8 handshake without authentication
+HANDSHAKE = [b"RFB 003.008\n", b"\x01\x01", b"\x00\x00\x00\x00", SERVER_INIT]
+# Client side: version, security type None, shared ClientInit
+CLIENT_HANDSHAKE = [b"RFB 003.008\n", b"\x01", b"\x01"]
+BPP = 4
+
+def _rect(width: int, height: int, encoding: int, payload: bytes = b"") -> bytes:
+    return struct.pack(">HHHHi", 0, 0, width, height, encoding) + payload
+
+def _update(*rects: bytes, count=None) -> bytes:
+    return struct.pack(">BxH", 0, len(rects) if count is None else count) + b"".join(rects)
+
+def _pixel(value: int) -> bytes:
+    return bytes([value]) * BPP
+
+def _hextile() -> bytes:
+    # 20x20 covers four tiles: 16x16, 4x16, 16x4 and 4x4
+    tiles = [
+        b"\x01" + _pixel(1) * 16 * 16,                                  # raw
+        b"\x02" + _pixel(2),                                            # background only
+        b"\x0e" + _pixel(3) + _pixel(4) + b"\x02" + b"\x00\x11" * 2,    # fg + mono subrects
+        b"\x1a" + _pixel(5) + b"\x01" + _pixel(6) + b"\x00\x11",        # coloured subrects
+    ]
+    return _rect(20, 20, 5, b"".join(tiles))
+
+SERVER_MESSAGES = [
+    _update(_rect(2, 2, 0, _pixel(7) * 4)),                                        # Raw
+    _update(_rect(2, 2, 1, b"\x00\x01\x00\x01")),                                   # CopyRect
+    _update(_rect(4, 4, 2, struct.pack(">I", 2) + _pixel(8) + (_pixel(9) + b"\x00" * 8) * 2)),  # RRE
+    _update(_hextile()),
+    _update(_rect(8, 2, -239, _pixel(1) * 16 + b"\xff\xff")),                       # Cursor
+    _update(_rect(0, 0, -307, struct.pack(">I", 5) + b"hello")),                    # DesktopName
+    _update(_rect(4, 4, -308, b"\x01\x00\x00\x00" + b"\x00" * 16)),                  # ExtendedDesktopSize
+    _update(_rect(8, 8, -223)),                                                     # DesktopSize
+    _update(_rect(1, 1, 0, _pixel(1)), _rect(0, 0, -224), count=0xFFFF),            # LastRect
+    struct.pack(">BxHH", 1, 0, 2) + b"\x00" * 12,                                   # SetColourMapEntries
+    b"\x02",                                                                        # Bell
+    struct.pack(">B3xI", 3, 3) + b"abc",                                            # ServerCutText
+]
+SERVER_TYPES = [0] * 9 + [1, 2, 3]
+
+def _messages(pieces):
+    messages = {}
+    for piece in pieces:
+        messages.setdefault(piece.seq, []).append(piece)
+    return messages
+
+def test_server_stream_frames_every_encoding_across_any_split():
+    data = b"".join(SERVER_MESSAGES)
+    for size in (1, 2, 3, 7, 64, len(data)):
+        stream = _ServerStream(PIXEL_FORMAT)
+        pieces = [piece for start in range(0, len(data), size) for piece in stream.feed(data[start:start + size])]
+        messages = _messages(pieces)
+        assert sorted(messages) == list(range(1, len(SERVER_MESSAGES) + 1))
+        for seq, expected, message_type in zip(sorted(messages), SERVER_MESSAGES, SERVER_TYPES):
+            parts = messages[seq]
+            assert b"".join(part.data for part in parts) == expected
+            assert {part.type for part in parts} == {message_type}
+            assert [part.first for part in parts] == [True] + [False] * (len(parts) - 1)
+            assert [part.last for part in parts] == [False] * (len(parts) - 1) + [True]
+        assert stream.next_seq == len(SERVER_MESSAGES) + 1
+
+def test_server_stream_follows_pixel_format_changes():
+    stream = _ServerStream(PIXEL_FORMAT)
+    stream.pixel_format = struct.pack(">BBBBHHHBBB3x", 8, 8, 0, 1, 7, 7, 3, 0, 3, 6)
+    message = _update(_rect(2, 2, 0, b"\x01" * 4)) + b"\x02"
+    assert [piece.last for piece in stream.feed(message)] == [True, True]
+
+def test_client_stream_splits_handshake_and_messages():
+    stream = _ClientStream()
+    vnc_auth = [b"RFB 003.008\n", b"\x02", b"\x00" * 16, b"\x01"]
+    set_encodings = struct.pack(">BxHii", 2, 2, 0, 16)
+    cut_text = struct.pack(">B3xI", 6, 2) + b"hi"
+    data = b"".join(vnc_auth) + set_encodings + b"\x03\x01" + b"\x00" * 8 + cut_text
+    messages = [message for byte in range(len(data)) for message in stream.feed(data[byte:byte + 1])]
+    assert messages[:4] == [(None, part) for part in vnc_auth]
+    assert messages[4:] == [(2, set_encodings), (3, b"\x03\x01" + b"\x00" * 8), (6, cut_text)]
+    assert stream.handshake_done
+
+def test_filter_encodings_drops_stateful_encodings():
+    message = struct.pack(">BxH4i", 2, 4, 16, 7, 5, -239)
+    assert _filter_encodings(message) == struct.pack(">BxH2i", 2, 2, 5, -239)
+    assert _filter_encodings(struct.pack(">BxHi", 2, 1, 16)) == struct.pack(">BxHi", 2, 1, 0)
+
+def test_parse_server_init():
+    assert _parse_server_init(b"".join(HANDSHAKE)) == (4, 4, PIXEL_FORMAT)
+
+def test_drop_updates_keeps_the_message_being_sent():
+    async def main():
+        viewer = VncViewer(None, False, max_queue=3, max_queue_bytes=1 << 20, resync=None)
+        viewer.sync_seq = 1
+        viewer.offer(_Piece(b"a", 1, 0, True, False))
+        viewer._queue.popleft()
+        viewer._sending_seq = 1
+        viewer.offer(_Piece(b"b", 1, 0, False, True))
+        viewer.offer(_Piece(b"c", 2, 0, True, True))
+        viewer.offer(_Piece(b"\x02", 3, 2, True, True))
+        viewer.offer(_Piece(b"d", 4, 0, True, False))
+        # Update 4 was dropped along with 2, so its tail is dropped as well
+        viewer.offer(_Piece(b"e", 4, 0, False, True))
+        assert [piece.data for piece in viewer._queue] == [b"b", b"\x02"]
+        assert viewer.updates_dropped == 2 and viewer.needs_resync
+    asyncio.run(main())
+
+class _Upstream:
+    def __init__(self):
+        self.frames: asyncio.Queue = asyncio.Queue()
+        self.sent = []
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        frame = await self.frames.get()
+        if frame is None:
+            raise StopAsyncIteration
+        return frame
+
+    async def send(self, data: bytes):
+        self.sent.append(data)
+
+    async def close(self):
+        self.frames.put_nowait(None)
+
+class _WebSocket:
+    def __init__(self):
+        self.incoming: asyncio.Queue = asyncio.Queue()
+        self.received = bytearray()
+        self.delay = 0.0
+        self.close_code = None
+
+    async def receive(self):
+        return await self.incoming.get()
+
+    async def send_bytes(self, data: bytes):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.received += data
+
+    async def close(self, code: int = 1000):
+        self.close_code = code
+
+    def send(self, *messages: bytes):
+        for message in messages:
+            self.incoming.put_nowait({"type": "websocket.receive", "bytes": message})
+
+    def leave(self):
+        self.incoming.put_nowait({"type": "websocket.disconnect"})
+
+def _relay(upstream: _Upstream, **kwargs) -> VncRelay:
+    async def connect(url, subprotocols=None):
+        return upstream
+    return VncRelay("s", "ws://sandbox", connect, **kwargs)
+
+async def _settle():
+    await asyncio.sleep(0.02)
+
+async def _attach_driver(relay: VncRelay, upstream: _Upstream) -> _WebSocket:
+    driver = _WebSocket()
+    asyncio.create_task(relay.attach(driver, True))
+    await _settle()
+    for frame in HANDSHAKE:
+        upstream.frames.put_nowait(frame)
+    driver.send(*CLIENT_HANDSHAKE, struct.pack(">BxHii", 2, 2, 16, 0))
+    await _settle()
+    return driver
+
+def _received_messages(websocket: _WebSocket):
+    handshake = b"".join(HANDSHAKE)
+    assert bytes(websocket.received[:len(handshake)]) == handshake
+    data = bytes(websocket.received[len(handshake):])
+    messages = _messages(_ServerStream(PIXEL_FORMAT).feed(data))
+    assert all(parts[-1].last for parts in messages.values())
+    return [b"".join(part.data for part in parts) for parts in messages.values()]
+
+def test_late_viewer_gets_the_handshake_and_starts_on_a_message_boundary():
+    async def main():
+        upstream = _Upstream()
+        relay = _relay(upstream)
+        driver = await _attach_driver(relay, upstream)
+        assert struct.pack(">BxHi", 2, 1, 0) in upstream.sent
+
+        first, second = SERVER_MESSAGES[0], SERVER_MESSAGES[3]
+        upstream.frames.put_nowait(first[:10])
+        await _settle()
+        viewer = _WebSocket()
+        asyncio.create_task(relay.attach(viewer, False))
+        viewer.send(*CLIENT_HANDSHAKE)
+        await _settle()
+        upstream.frames.put_nowait(first[10:] + second[:5])
+        upstream.frames.put_nowait(second[5:])
+        await _settle()
+
+        assert _received_messages(driver) == [first, second]
+        assert _received_messages(viewer) == [second]
+        assert struct.pack(">BBHHHH", 3, 0, 0, 0, 4, 4) in upstream.sent
+        await relay.close()
+    asyncio.run(main())
+
+def test_slow_viewer_drops_updates_then_resyncs():
+    async def main():
+        upstream = _Upstream()
+        relay = _relay(upstream, max_queue=4)
+        driver = await _attach_driver(relay, upstream)
+        driver.delay = 0.05
+        for _ in range(30):
+            upstream.frames.put_nowait(SERVER_MESSAGES[0])
+        upstream.frames.put_nowait(SERVER_MESSAGES[10])
+        await asyncio.sleep(0.1)
+        assert relay.stats()["updates_dropped"] > 0
+        driver.delay = 0
+        await asyncio.sleep(0.3)
+
+        messages = _received_messages(driver)
+        assert 0 < len(messages) < 31 and messages[-1] == SERVER_MESSAGES[10]
+        assert relay.resyncs == 1
+        assert struct.pack(">BBHHHH", 3, 0, 0, 0, 4, 4) in upstream.sent
+        await relay.close()
+    asyncio.run(main())
+
+def test_driver_leaving_during_the_handshake_closes_the_relay():
+    async def main():
+        upstream = _Upstream()
+        relay = _relay(upstream)
+        driver, viewer = _WebSocket(), _WebSocket()
+        driver_task = asyncio.create_task(relay.attach(driver, True))
+        viewer_task = asyncio.create_task(relay.attach(viewer, False))
+        await _settle()
+        upstream.frames.put_nowait(HANDSHAKE[0])
+        driver.leave()
+        await asyncio.wait_for(asyncio.gather(driver_task, viewer_task), 1)
+        assert relay.closed
+        assert viewer.close_code == 1013
+    asyncio.run(main())
+
+def test_waiting_viewer_gives_up_when_the_handshake_stalls():
+    async def main():
+        upstream = _Upstream()
+        relay = _relay(upstream, handshake_timeout=0.05)
+        driver, viewer = _WebSocket(), _WebSocket()
+        asyncio.create_task(relay.attach(driver, True))
+        viewer_task = asyncio.create_task(relay.attach(viewer, False))
+        await asyncio.wait_for(viewer_task, 1)
+        assert viewer.close_code == 1013
+        await relay.close()
+    asyncio.run(main())
+
+def test_unshared_upstream_keeps_encodings_and_turns_away_other_viewers():
+    async def main():
+        upstream = _Upstream()
+        relay = _relay(upstream, share_upstream=False)
+        driver = await _attach_driver(relay, upstream)
+        assert struct.pack(">BxHii", 2, 2, 16, 0) in upstream.sent
+
+        # ZRLE is not framed; it passes through as it arrives
+        zrle = _update(_rect(4, 4, 16, struct.pack(">I", 3) + b"zzz"))
+        upstream.frames.put_nowait(zrle[:7])
+        upstream.frames.put_nowait(zrle[7:])
+        await _settle()
+        assert bytes(driver.received) == b"".join(HANDSHAKE) + zrle
+
+        viewer = _WebSocket()
+        await asyncio.wait_for(relay.attach(viewer, False), 1)
+        assert viewer.close_code == 1013 and len(relay.viewers) == 1
+        await relay.close()
+    asyncio.run(main())